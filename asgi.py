@@ -0,0 +1,211 @@
+import asyncio
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timezone
+from urllib.parse import parse_qsl
+
+from asgiref.wsgi import WsgiToAsgi
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine
+from werkzeug.datastructures import MultiDict
+from werkzeug.exceptions import HTTPException
+from werkzeug.http import http_date, parse_cookie, parse_date, parse_etags, quote_etag
+from werkzeug.routing import RequestRedirect
+from werkzeug.utils import get_content_type
+
+from db import db, News, NEWS_PUBLISHED, SQLITE_PRAGMAS, apply_sqlite_pragmas
+from news import LIST_COLUMNS, keyset_before
+
+# Асинхронні драйвери для тих самих баз, що й у синхронного двигуна
+ASYNC_DRIVERS = {'sqlite': 'sqlite+aiosqlite', 'postgresql': 'postgresql+asyncpg'}
+
+# Публічні сторінки з кешем, які віддаються прямо з циклу подій без потоку
+CACHED_ENDPOINTS = {'index', 'all_news', 'view_news', 'view_menu_page'}
+
+FEED_BATCH = 100
+
+
+def async_database_url(url):
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f'Немає асинхронного драйвера для {backend}')
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+
+def _headers(scope):
+    return {name.decode('latin1').lower(): value.decode('latin1') for name, value in scope.get('headers', ())}
+
+
+class PublicASGIApp:
+    # ASGI-вхід: кешовані публічні сторінки та JSON Feed обслуговуються в циклі подій,
+    # усе інше (адмінка, промахи кешу, форми) — звичайний Flask у пулі потоків через WsgiToAsgi.
+    # Повільний клієнт на кешованій сторінці чи стрічці тримає лише корутину, а не потік.
+
+    def __init__(self, app):
+        self.app = app
+        self.wsgi = WsgiToAsgi(app)
+        with app.app_context():
+            url = db.engine.url
+        self.engine = create_async_engine(async_database_url(url))
+        apply_sqlite_pragmas(self.engine.sync_engine, app.config.get('SQLITE_PRAGMAS', SQLITE_PRAGMAS))
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self._lifespan(receive, send)
+        if scope['type'] == 'http' and scope['method'] in ('GET', 'HEAD'):
+            handled = await self._handle_public(scope, send)
+            if handled:
+                return
+        return await self.wsgi(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                # Потоки, у яких WsgiToAsgi виконує Flask; типово — як у ThreadPoolExecutor
+                threads = int(os.environ.get('ASGI_THREADS', 0))
+                if threads:
+                    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=threads))
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.engine.dispose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def _adapter(self, scope, headers):
+        server = scope.get('server') or ('localhost', None)
+        host = headers.get('host') or (f'{server[0]}:{server[1]}' if server[1] else server[0])
+        return self.app.url_map.bind(host, script_name=scope.get('root_path') or '/',
+                                     url_scheme=scope.get('scheme', 'http'))
+
+    def _path(self, scope):
+        path, root_path = scope['path'], scope.get('root_path', '')
+        if root_path and path.startswith(root_path):
+            path = path[len(root_path):]
+        return path or '/'
+
+    def _has_flashes(self, headers):
+        # Flash-повідомлення з сесії показує лише Flask, такі запити йдуть звичайним шляхом
+        cookie = parse_cookie(headers.get('cookie', '')).get(self.app.config['SESSION_COOKIE_NAME'])
+        if not cookie:
+            return False
+        serializer = self.app.session_interface.get_signing_serializer(self.app)
+        try:
+            data = serializer.loads(cookie, max_age=int(self.app.permanent_session_lifetime.total_seconds()))
+        except Exception:
+            return False
+        return bool(data.get('_flashes'))
+
+    async def _handle_public(self, scope, send):
+        headers = _headers(scope)
+        adapter = self._adapter(scope, headers)
+        path = self._path(scope)
+        try:
+            endpoint, values = adapter.match(path, method='GET')
+        except (HTTPException, RequestRedirect):
+            return False
+
+        watcher = self.app.extensions['version_watcher']
+        if watcher.due():
+            # Той самий звірений лічильник, що й у Flask, але без блокування циклу подій
+            async with self.engine.connect() as connection:
+                watcher.apply((await connection.execute(watcher.statement())).all())
+
+        if endpoint == 'news_feed' and self.app.config.get('NEWS_FEED_ENABLED', True):
+            await self._news_feed(adapter, scope, send)
+            return True
+        if endpoint in CACHED_ENDPOINTS and self.app.config.get('PAGE_CACHE_ENABLED', True) \
+                and not self._has_flashes(headers):
+            return await self._cached_page(endpoint, path, scope, headers, send)
+        return False
+
+    async def _cached_page(self, endpoint, path, scope, headers, send):
+        page_cache = self.app.extensions['page_cache']
+        args = MultiDict(parse_qsl(scope.get('query_string', b'').decode('latin1'), keep_blank_values=True))
+        page = page_cache.backend.get(page_cache.key(endpoint, path, args))
+        if page is None:
+            # Промах рендерить Flask і кладе сторінку в кеш для наступних запитів
+            return False
+
+        last_modified = page.last_modified.replace(tzinfo=timezone.utc, microsecond=0)
+        response_headers = [
+            (b'etag', quote_etag(page.etag).encode('latin1')),
+            (b'last-modified', http_date(last_modified).encode('latin1')),
+            (b'cache-control', b'no-cache'),
+        ]
+        if_none_match = headers.get('if-none-match')
+        if_modified_since = parse_date(headers.get('if-modified-since'))
+        if (parse_etags(if_none_match).contains(page.etag) if if_none_match
+                else if_modified_since is not None and if_modified_since >= last_modified):
+            await send({'type': 'http.response.start', 'status': 304, 'headers': response_headers})
+            await send({'type': 'http.response.body', 'body': b''})
+            return True
+
+        response_headers += [
+            (b'content-type', get_content_type(page.mimetype, 'utf-8').encode('latin1')),
+            (b'content-length', str(len(page.body)).encode('latin1')),
+        ]
+        await send({'type': 'http.response.start', 'status': 200, 'headers': response_headers})
+        await send({'type': 'http.response.body', 'body': b'' if scope['method'] == 'HEAD' else page.body})
+        return True
+
+    async def _news_feed(self, adapter, scope, send):
+        # Той самий JSON Feed, що й /news/feed.json у Flask, але з'єднання з БД береться лише
+        # на час вибірки чергової сторінки, а не на весь час передачі повільному клієнту
+        await send({'type': 'http.response.start', 'status': 200,
+                    'headers': [(b'content-type', get_content_type('application/feed+json', 'utf-8').encode())]})
+        if scope['method'] == 'HEAD':
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+
+        header = json.dumps({
+            'version': 'https://jsonfeed.org/version/1.1',
+            'title': 'Новини',
+            'home_page_url': adapter.build('index', force_external=True),
+        }, ensure_ascii=False)[:-1] + ', "items": ['
+        await send({'type': 'http.response.body', 'body': header.encode('utf-8'), 'more_body': True})
+
+        position = None
+        number = 0
+        while True:
+            statement = select(*LIST_COLUMNS).where(News.status == NEWS_PUBLISHED) \
+                .order_by(News.created_at.desc(), News.id.desc()).limit(FEED_BATCH)
+            if position:
+                statement = statement.where(keyset_before(position))
+            async with self.engine.connect() as connection:
+                rows = (await connection.execute(statement)).all()
+            if not rows:
+                break
+
+            chunk = []
+            for article in rows:
+                item = {
+                    'id': str(article.id),
+                    'url': adapter.build('view_news', {'news_id': article.id}, force_external=True),
+                    'title': article.title,
+                    'summary': article.excerpt or '',
+                    'date_published': article.created_at.isoformat() + 'Z',
+                }
+                if article.image:
+                    item['image'] = adapter.build('static', {'filename': f'uploads/{article.image}'},
+                                                  force_external=True)
+                chunk.append((', ' if number else '') + json.dumps(item, ensure_ascii=False))
+                number += 1
+            await send({'type': 'http.response.body', 'body': ''.join(chunk).encode('utf-8'), 'more_body': True})
+
+            if len(rows) < FEED_BATCH:
+                break
+            position = (rows[-1].created_at, rows[-1].id)
+
+        await send({'type': 'http.response.body', 'body': b']}'})
+
+
+def create_asgi_app(app=None):
+    if app is None:
+        from main import app
+    return PublicASGIApp(app)
+
+
+# uvicorn asgi:application або gunicorn -k uvicorn.workers.UvicornWorker asgi:application
+application = create_asgi_app()
@@ -0,0 +1,131 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+
+from flask import abort, request, send_from_directory, url_for
+from werkzeug.security import safe_join
+
+from storage import HASHED_NAME
+
+try:
+    import brotli
+except ImportError:  # без brotli віддаємо лише gzip
+    brotli = None
+
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+# Каталоги static/, які не є частиною збірки
+SKIP_DIRS = {DIST_DIR, 'uploads'}
+COMPRESSIBLE = {'.css', '.js', '.mjs', '.svg', '.json', '.map', '.txt', '.html', '.xml', '.ico', '.ttf', '.eot'}
+ONE_YEAR = 365 * 24 * 3600
+
+
+def precompress(path):
+    # Поруч з файлом кладемо .gz і .br, якщо тип файлу варто стискати
+    if os.path.splitext(path)[1].lower() not in COMPRESSIBLE:
+        return
+    with open(path, 'rb') as f:
+        data = f.read()
+    with open(path + '.gz', 'wb') as f:
+        f.write(gzip.compress(data, compresslevel=9, mtime=0))
+    if brotli is not None:
+        with open(path + '.br', 'wb') as f:
+            f.write(brotli.compress(data, quality=11))
+
+
+def build_assets(static_folder, echo=print):
+    # Копіює static/ у static/dist з хешем вмісту в імені та пише manifest.json
+    dist_folder = os.path.join(static_folder, DIST_DIR)
+    if os.path.isdir(dist_folder):
+        shutil.rmtree(dist_folder)
+    os.makedirs(dist_folder)
+
+    manifest = {}
+    for root, dirs, files in os.walk(static_folder):
+        if root == static_folder:
+            dirs[:] = [name for name in dirs if name not in SKIP_DIRS]
+        for name in files:
+            source = os.path.join(root, name)
+            relative = os.path.relpath(source, static_folder).replace(os.sep, '/')
+            with open(source, 'rb') as f:
+                digest = hashlib.sha256(f.read()).hexdigest()[:12]
+            stem, ext = os.path.splitext(relative)
+            fingerprinted = f'{DIST_DIR}/{stem}.{digest}{ext}'
+
+            target = os.path.join(static_folder, fingerprinted)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copyfile(source, target)
+            precompress(target)
+            manifest[relative] = fingerprinted
+
+    with open(os.path.join(dist_folder, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    echo(f'Зібрано файлів: {len(manifest)}')
+    return manifest
+
+
+class AssetPipeline:
+    # Віддає статику за іменами з хешем, попередньо стиснені варіанти та довготривале кешування
+
+    def __init__(self, app):
+        self.app = app
+        self.static_folder = app.static_folder
+        self.manifest = {}
+        self.fingerprinted = set()
+        self.reload()
+        app.add_template_global(self.asset_url, 'asset_url')
+        app.view_functions['static'] = self.send_static
+
+    def reload(self):
+        try:
+            with open(os.path.join(self.static_folder, DIST_DIR, MANIFEST_NAME), encoding='utf-8') as f:
+                self.manifest = json.load(f)
+        except (OSError, ValueError):
+            self.manifest = {}
+        self.fingerprinted = set(self.manifest.values())
+
+    def asset_url(self, filename):
+        return url_for('static', filename=self.manifest.get(filename, filename))
+
+    def _is_immutable(self, filename):
+        if filename in self.fingerprinted:
+            return True
+        folder, _, name = filename.rpartition('/')
+        return folder == 'uploads' and bool(HASHED_NAME.match(name))
+
+    def send_static(self, filename):
+        if safe_join(self.static_folder, filename) is None:
+            abort(404)
+        immutable = self._is_immutable(filename)
+        served, encoding = filename, None
+        accepted = request.accept_encodings
+        for candidate, suffix in (('br', '.br'), ('gzip', '.gz')):
+            if accepted[candidate] and os.path.isfile(os.path.join(self.static_folder, filename + suffix)):
+                served, encoding = filename + suffix, candidate
+                break
+
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        max_age = ONE_YEAR if immutable else self.app.get_send_file_max_age(filename)
+
+        accel_prefix = self.app.config.get('ASSETS_X_ACCEL_PREFIX')
+        if accel_prefix:
+            # nginx сам віддає файл з internal-локації, воркер не читає байти
+            if not os.path.isfile(os.path.join(self.static_folder, served)):
+                abort(404)
+            response = self.app.response_class(mimetype=mimetype)
+            response.headers['X-Accel-Redirect'] = accel_prefix.rstrip('/') + '/' + served
+        else:
+            # USE_X_SENDFILE з конфігурації Flask теж враховується в send_from_directory
+            response = send_from_directory(self.static_folder, served, mimetype=mimetype, max_age=max_age)
+
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+        if immutable:
+            response.cache_control.max_age = ONE_YEAR
+            response.cache_control.public = True
+            response.cache_control.immutable = True
+        return response
@@ -0,0 +1,206 @@
+import itertools
+import math
+import multiprocessing
+import sqlite3
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+
+from werkzeug.security import check_password_hash
+
+
+class LoginOverloaded(Exception):
+    # Черга перевірки паролів заповнена — запит відхиляється, а не чекає на воркер
+    pass
+
+
+def _check_password(password_hash, password):
+    return check_password_hash(password_hash, password)
+
+
+class LoginMetrics:
+    # Лічильники та кільцевий буфер тривалостей для /admin/perf
+
+    def __init__(self, history=500):
+        self._lock = threading.Lock()
+        self._verify = deque(maxlen=history)
+        self._requests = deque(maxlen=history)
+        self.counters = {'attempts': 0, 'throttled': 0, 'overloaded': 0}
+
+    def count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def record_verify(self, seconds):
+        with self._lock:
+            self._verify.append(seconds)
+
+    def record_request(self, seconds):
+        with self._lock:
+            self._requests.append(seconds)
+
+    def report(self):
+        # perf імпортує db, а db — цей модуль, тому імпорт тут
+        from perf import percentile
+
+        with self._lock:
+            verify = sorted(value * 1000 for value in self._verify)
+            requests = sorted(value * 1000 for value in self._requests)
+            counters = dict(self.counters)
+
+        return dict(counters,
+                    verify_p50_ms=percentile(verify, 50), verify_p95_ms=percentile(verify, 95),
+                    login_p50_ms=percentile(requests, 50), login_p95_ms=percentile(requests, 95))
+
+
+class PasswordVerifier:
+    # Перевірка хешу пароля (навмисно повільний scrypt/pbkdf2) в окремих процесах.
+    # Кількість завдань у черзі обмежена, тож сплеск входів не забирає потоки, що рендерять сторінки.
+
+    def __init__(self, max_workers=2, max_pending=8, timeout=10, metrics=None):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.metrics = metrics
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        # Пул створюється ліниво, вже після fork воркера gunicorn. На той час у процесі працюють
+        # потоки планувальника й обробки зображень, тож fork міг би успадкувати захоплений лок:
+        # процеси стартують начисто через forkserver (spawn там, де його немає, як на Windows)
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+                    self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                         mp_context=multiprocessing.get_context(method))
+        return self._executor
+
+    def verify(self, password_hash, password):
+        if not self._slots.acquire(blocking=False):
+            if self.metrics:
+                self.metrics.count('overloaded')
+            raise LoginOverloaded()
+        started = time.perf_counter()
+        try:
+            future = self._get_executor().submit(_check_password, password_hash, password)
+        except Exception:
+            self._slots.release()
+            raise
+        # Місце в черзі звільняється, лише коли завдання справді завершилося або скасоване,
+        # а не коли запит перестав чекати
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            future.cancel()
+            raise LoginOverloaded()
+        finally:
+            if self.metrics:
+                self.metrics.record_verify(time.perf_counter() - started)
+
+
+_verifier = None
+
+
+def configure_password_verifier(verifier):
+    global _verifier
+    _verifier = verifier
+
+
+def verify_password(password_hash, password):
+    if _verifier is None:
+        return _check_password(password_hash, password)
+    return _verifier.verify(password_hash, password)
+
+
+def _take_token(tokens, updated, capacity, refill_rate, now):
+    # Повертає (чи дозволено, залишок токенів, коли відро знову стане повним)
+    tokens = min(capacity, tokens + (now - updated) * refill_rate)
+    allowed = tokens >= 1
+    if allowed:
+        tokens -= 1
+    if tokens >= capacity:
+        full_at = now
+    else:
+        full_at = now + (capacity - tokens) / refill_rate if refill_rate else float('inf')
+    return allowed, tokens, full_at
+
+
+class MemoryBucketStore:
+    # Відра токенів у пам'яті процесу. Одне сховище ділять ліміти з різними параметрами,
+    # тому кожне відро пам'ятає, коли воно знову стане повним, а не лише свої токени.
+
+    MAX_BUCKETS = 100000
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, refill_rate, now):
+        with self._lock:
+            tokens, updated, _ = self._buckets.get(key, (capacity, now, now))
+            allowed, tokens, full_at = _take_token(tokens, updated, capacity, refill_rate, now)
+            self._buckets[key] = (tokens, now, full_at)
+            if len(self._buckets) > self.MAX_BUCKETS:
+                # Повні відра нічого не обмежують, їх можна забути
+                self._buckets = {k: v for k, v in self._buckets.items() if v[2] > now}
+            return allowed, tokens
+
+
+class SQLiteBucketStore:
+    # Відра токенів у спільному файлі SQLite, щоб обмеження діяло на всі воркери разом
+
+    # Раз на стільки спроб процес видаляє відра, які вже знову повні
+    PRUNE_EVERY = 256
+
+    def __init__(self, path):
+        self.path = path
+        self._calls = itertools.count(1)
+        connection = self._connect()
+        try:
+            connection.execute('CREATE TABLE IF NOT EXISTS login_buckets (key TEXT PRIMARY KEY, '
+                               'tokens REAL NOT NULL, updated REAL NOT NULL, full_at REAL NOT NULL)')
+            connection.execute('CREATE INDEX IF NOT EXISTS ix_login_buckets_full_at ON login_buckets (full_at)')
+        finally:
+            connection.close()
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        connection.execute('PRAGMA journal_mode = WAL')
+        return connection
+
+    def take(self, key, capacity, refill_rate, now):
+        connection = self._connect()
+        try:
+            connection.execute('BEGIN IMMEDIATE')
+            row = connection.execute('SELECT tokens, updated FROM login_buckets WHERE key = ?', (key,)).fetchone()
+            tokens, updated = row if row else (capacity, now)
+            allowed, tokens, full_at = _take_token(tokens, updated, capacity, refill_rate, now)
+            connection.execute('INSERT OR REPLACE INTO login_buckets (key, tokens, updated, full_at) '
+                               'VALUES (?, ?, ?, ?)', (key, tokens, now, full_at))
+            if next(self._calls) % self.PRUNE_EVERY == 0:
+                # Кожне нове ім'я чи IP під час перебору паролів інакше лишило б рядок назавжди
+                connection.execute('DELETE FROM login_buckets WHERE full_at <= ?', (now,))
+            connection.execute('COMMIT')
+            return allowed, tokens
+        finally:
+            connection.close()
+
+
+class RateLimiter:
+    # Token bucket: capacity спроб одразу, далі refill_per_minute нових спроб за хвилину
+
+    def __init__(self, store, capacity, refill_per_minute):
+        self.store = store
+        self.capacity = capacity
+        self.refill_rate = refill_per_minute / 60.0
+
+    def acquire(self, key):
+        # 0 — спробу дозволено, інакше — через скільки секунд у відрі з'явиться наступна
+        allowed, tokens = self.store.take(key, self.capacity, self.refill_rate, time.time())
+        if allowed:
+            return 0
+        return max(1, math.ceil((1 - tokens) / self.refill_rate)) if self.refill_rate else 60
@@ -0,0 +1,477 @@
+"""Бенчмарк публічних та адміністративних маршрутів.
+
+    python -m benchmarks.bench --news 10000 --output bench.json
+    python -m benchmarks.bench --compare bench-before.json --output bench-after.json
+
+Створює окрему синтетичну базу, проганяє маршрути через test client Flask та
+багатопотоковий WSGI-сервер (або uvicorn з --server asgi) і зберігає p50/p95/p99, RPS,
+SQL-запити на запит і пік RSS у JSON.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import re
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from datetime import datetime, timedelta
+
+from PIL import Image
+from sqlalchemy import insert
+from sqlalchemy.exc import OperationalError
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+from content import render_content
+from db import db, User, News, MenuItem
+import migrations
+from menu_io import import_menu
+from news import news_page
+from perf import percentile
+from search import rebuild_search_index
+
+QUERIES_RE = re.compile(r'desc="(\d+) queries"')
+
+# Розмір тестового зображення для /upload-image: більший за всі варіанти, щоб зменшення справді працювало
+UPLOAD_SIZE = (1800, 1200)
+
+
+def _upload_png(number):
+    # Кожне завантаження має інший колір, тож хеш вмісту новий і обробка не пропускається
+    color = (number & 0xFF, (number >> 8) & 0xFF, (number >> 16) & 0xFF)
+    buffer = io.BytesIO()
+    Image.new('RGB', UPLOAD_SIZE, color).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Бенчмарк маршрутів school22.sumy')
+    parser.add_argument('--news', type=int, default=10000, help='кількість новин')
+    parser.add_argument('--content-size', type=int, default=20000, help='розмір content у символах')
+    parser.add_argument('--menu-width', type=int, default=25, help='кількість головних пунктів меню')
+    parser.add_argument('--menu-children', type=int, default=10, help='підпунктів у кожного пункту')
+    parser.add_argument('--menu-depth', type=int, default=2, help='глибина меню')
+    parser.add_argument('--requests', type=int, default=200, help='запитів на сценарій (test client)')
+    parser.add_argument('--threads', type=int, default=8, help='потоків генератора навантаження')
+    parser.add_argument('--duration', type=float, default=10.0, help='тривалість навантаження, с')
+    parser.add_argument('--page-cache', action='store_true', help='не вимикати кеш сторінок')
+    parser.add_argument('--server', choices=('wsgi', 'asgi'), default='wsgi',
+                        help='сервер для навантаження: потоковий WSGI або uvicorn з asgi.application')
+    parser.add_argument('--slow-clients', type=int, default=0,
+                        help='скільки з\'єднань повільно читають /news/feed.json під час навантаження')
+    parser.add_argument('--sqlite-pragmas', choices=('on', 'off'), default='on',
+                        help='off — SQLite без WAL та busy_timeout, як до налаштування двигуна (для порівняння)')
+    parser.add_argument('--seed', type=int, default=22, help='зерно генератора випадкових чисел')
+    parser.add_argument('--output', default='bench.json', help='куди зберегти результати')
+    parser.add_argument('--compare', help='попередній JSON для порівняння')
+    parser.add_argument('--fail-threshold', type=float, default=20.0,
+                        help='відсоток погіршення p95, при якому завершуємося з помилкою')
+    return parser.parse_args(argv)
+
+
+# Синтетичні дані
+
+def _paragraphs(rng, size):
+    words = ['школа', 'учні', 'батьки', 'урок', 'навчання', 'освіта', 'педагог', 'клас', 'захід', 'новина']
+    parts = []
+    length = 0
+    while length < size:
+        sentence = ' '.join(rng.choice(words) for _ in range(12)).capitalize() + '.'
+        parts.append(f'<p>{sentence}</p>')
+        length += len(sentence) + 7
+    return ''.join(parts)
+
+
+def _menu_tree(rng, width, children, depth, content_size, prefix='m'):
+    return [{
+        'title': f'Пункт {prefix}-{number}',
+        'slug': f'{prefix}-{number}',
+        'url': f'/page/{prefix}-{number}',
+        'content': _paragraphs(rng, content_size // 4),
+        'submenu': _menu_tree(rng, children, children, depth - 1, content_size, f'{prefix}-{number}')
+        if depth > 1 else [],
+    } for number in range(width)]
+
+
+def seed_database(args, rng):
+    migrations.upgrade(echo=lambda message: None)
+
+    admin = User(username='admin', is_admin=True)
+    admin.set_password('admin')
+    db.session.add(admin)
+
+    now = datetime.utcnow()
+    batch = []
+    for number in range(args.news):
+        content = _paragraphs(rng, args.content_size)
+        batch.append({
+            'title': f'Новина {number}',
+            'image': None,
+            'content': content,
+            'created_at': now - timedelta(minutes=number),
+            **render_content(content),
+        })
+        if len(batch) == 1000:
+            db.session.execute(insert(News), batch)
+            batch = []
+    if batch:
+        db.session.execute(insert(News), batch)
+    rebuild_search_index(db.session.connection(), kinds=('news',))
+    db.session.commit()
+
+    import_menu(_menu_tree(rng, args.menu_width, args.menu_children, args.menu_depth, args.content_size))
+    return admin.id
+
+
+# Вимірювання
+
+def _percentiles(values):
+    values = sorted(value * 1000 for value in values)
+    return {'p50_ms': percentile(values, 50), 'p95_ms': percentile(values, 95), 'p99_ms': percentile(values, 99)}
+
+
+def _queries(response):
+    match = QUERIES_RE.search(response.headers.get('Server-Timing', ''))
+    return int(match.group(1)) if match else None
+
+
+def run_scenario(make_request, count):
+    latencies = []
+    queries = []
+    errors = 0
+    started = time.perf_counter()
+    for number in range(count):
+        request_started = time.perf_counter()
+        response = make_request(number)
+        latencies.append(time.perf_counter() - request_started)
+        if response.status_code >= 400:
+            errors += 1
+        query_count = _queries(response)
+        if query_count is not None:
+            queries.append(query_count)
+    elapsed = time.perf_counter() - started
+
+    result = _percentiles(latencies)
+    result.update({
+        'requests': count,
+        'errors': errors,
+        'rps': round(count / elapsed, 1) if elapsed else None,
+        'queries_per_request': round(sum(queries) / len(queries), 2) if queries else None,
+    })
+    return result
+
+
+def build_scenarios(app, rng, admin_id, count):
+    with app.app_context():
+        news_ids = [row.id for row in db.session.query(News.id).all()]
+        slugs = [row.slug for row in db.session.query(MenuItem.slug).all()]
+        parent_ids = [row.id for row in db.session.query(MenuItem.id).filter_by(parent_id=None).all()]
+
+    public = app.test_client()
+    admin = app.test_client()
+    with admin.session_transaction() as session:
+        session['_user_id'] = str(admin_id)
+        session['_fresh'] = True
+
+    created_news = []
+    created_menu = []
+    # Кодування PNG не повинно потрапляти в заміри, тож файли готуються заздалегідь
+    uploads = [_upload_png(number) for number in range(count)]
+
+    def create_news(number):
+        response = admin.post('/admin/news/create', data={
+            'title': f'Бенчмарк {number}', 'content': _paragraphs(rng, 2000), 'image': ''})
+        with app.app_context():
+            created_news.append(db.session.query(News.id).order_by(News.id.desc()).first().id)
+        return response
+
+    def create_menu(number):
+        response = admin.post('/admin/menu/create', data={
+            'title': f'Бенчмарк {number}', 'slug': f'bench-{number}-{rng.random()}', 'url': '#',
+            'content': _paragraphs(rng, 500), 'parent_id': rng.choice(parent_ids)})
+        with app.app_context():
+            created_menu.append(db.session.query(MenuItem.id).order_by(MenuItem.id.desc()).first().id)
+        return response
+
+    return [
+        ('index', lambda n: public.get('/')),
+        ('all_news', lambda n: public.get('/news')),
+        ('view_news', lambda n: public.get(f'/news/{rng.choice(news_ids)}')),
+        ('view_menu_page', lambda n: public.get(f'/page/{rng.choice(slugs)}')),
+        ('search', lambda n: public.get('/search?q=школа')),
+        ('upload_image', lambda n: admin.post('/upload-image', data={
+            'upload': (io.BytesIO(uploads[n]), f'bench-{n}.png')},
+            content_type='multipart/form-data')),
+        ('admin_news_list', lambda n: admin.get('/admin/news')),
+        ('admin_create_news', create_news),
+        ('admin_edit_news', lambda n: admin.post(f'/admin/news/edit/{created_news[n % len(created_news)]}',
+                                                 data={'title': f'Змінено {n}', 'content': 'Текст',
+                                                       'image': ''})),
+        ('admin_delete_news', lambda n: admin.post(f'/admin/news/delete/{created_news.pop()}')),
+        ('admin_create_menu', create_menu),
+        ('admin_edit_menu', lambda n: admin.post(f'/admin/edit/{created_menu[n % len(created_menu)]}',
+                                                 data={'title': f'Бенчмарк змінено {n}', 'content': 'Текст'})),
+        ('admin_delete_menu', lambda n: admin.get(f'/admin/menu/delete/{created_menu.pop()}')),
+    ]
+
+
+class _QuietRequestHandler(WSGIRequestHandler):
+    # Рядок журналу на кожен запит за 10 с навантаження — тисячі рядків поверх результатів
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+def _start_wsgi(app):
+    server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=_QuietRequestHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server.server_port, server.shutdown
+
+
+def _start_asgi(app):
+    import uvicorn
+    from asgi import create_asgi_app
+
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(create_asgi_app(app), host='127.0.0.1', port=port,
+                                           log_level='warning', lifespan='on'))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+
+    def stop():
+        server.should_exit = True
+        thread.join()
+    return port, stop
+
+
+def _slow_client(port, stop):
+    # Читає стрічку по 1 КБ раз на 100 мс, як клієнт у повільній шкільній мережі
+    with socket.socket() as connection:
+        connection.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+        connection.connect(('127.0.0.1', port))
+        connection.sendall(b'GET /news/feed.json HTTP/1.1\r\nHost: 127.0.0.1\r\nConnection: close\r\n\r\n')
+        while not stop.is_set() and connection.recv(1024):
+            stop.wait(0.1)
+
+
+def run_load(app, paths, threads, duration, server='wsgi', slow_clients=0):
+    # Сервер (потоковий WSGI або uvicorn) і клієнти, що паралельно ходять по публічних сторінках
+    port, shutdown = _start_asgi(app) if server == 'asgi' else _start_wsgi(app)
+    base_url = f'http://127.0.0.1:{port}'
+
+    stop_slow = threading.Event()
+    slow = [threading.Thread(target=_slow_client, args=(port, stop_slow), daemon=True)
+            for _ in range(slow_clients)]
+    for thread in slow:
+        thread.start()
+
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker(worker_number):
+        rng = random.Random(worker_number)
+        local = []
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                with urllib.request.urlopen(base_url + rng.choice(paths)) as response:
+                    response.read()
+            except Exception:
+                with lock:
+                    errors[0] += 1
+                continue
+            local.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(local)
+
+    workers = [threading.Thread(target=worker, args=(number,)) for number in range(threads)]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    stop_slow.set()
+    for thread in slow:
+        thread.join()
+    shutdown()
+
+    result = _percentiles(latencies)
+    result.update({'server': server, 'threads': threads, 'slow_clients': slow_clients,
+                   'requests': len(latencies), 'errors': errors[0], 'rps': round(len(latencies) / elapsed, 1)})
+    return result
+
+
+def run_contention(app, readers, duration, content_size, rng):
+    # Читачі першої сторінки новин і один адміністратор, що безперервно додає новини, — на рівні БД,
+    # без HTTP і шаблонів. Без WAL запис блокує читачів і навпаки: це видно як помилки «database is locked».
+    stop = threading.Event()
+    lock = threading.Lock()
+    read_latencies, write_latencies = [], []
+    errors = {'read': 0, 'write': 0}
+    content = _paragraphs(rng, content_size)
+
+    def reader():
+        local = []
+        with app.app_context():
+            while not stop.is_set():
+                started = time.perf_counter()
+                try:
+                    news_page()
+                    db.session.rollback()
+                except OperationalError:
+                    db.session.rollback()
+                    with lock:
+                        errors['read'] += 1
+                    continue
+                local.append(time.perf_counter() - started)
+            db.session.remove()
+        with lock:
+            read_latencies.extend(local)
+
+    def writer():
+        local = []
+        with app.app_context():
+            number = 0
+            while not stop.is_set():
+                number += 1
+                started = time.perf_counter()
+                try:
+                    db.session.add(News(title=f'Навантаження {number}', content=content))
+                    db.session.commit()
+                except OperationalError:
+                    db.session.rollback()
+                    with lock:
+                        errors['write'] += 1
+                    continue
+                local.append(time.perf_counter() - started)
+            db.session.remove()
+        with lock:
+            write_latencies.extend(local)
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)] + [threading.Thread(target=writer)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    return {
+        'readers': readers,
+        'reads': {**_percentiles(read_latencies), 'per_second': round(len(read_latencies) / elapsed, 1),
+                  'errors': errors['read']},
+        'writes': {**_percentiles(write_latencies), 'per_second': round(len(write_latencies) / elapsed, 1),
+                   'errors': errors['write']},
+    }
+
+
+def compare(previous, current, threshold):
+    regressions = []
+    for name, result in current['scenarios'].items():
+        before = previous.get('scenarios', {}).get(name, {}).get('p95_ms')
+        after = result.get('p95_ms')
+        if not before or after is None:
+            continue
+        change = (after - before) / before * 100
+        print(f'{name:20} p95 {before:9.2f} -> {after:9.2f} мс ({change:+.1f}%)')
+        if change > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    rng = random.Random(args.seed)
+    workdir = tempfile.mkdtemp(prefix='school22-bench-')
+
+    from main import create_app
+    config = {
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        'UPLOAD_FOLDER': os.path.join(workdir, 'uploads'),
+        'PAGE_CACHE_ENABLED': args.page_cache,
+        'PERF_ENABLED': True,
+        # Кількість SQL-запитів бенчмарк читає із заголовка Server-Timing
+        'PERF_SERVER_TIMING': True,
+        'PERF_HISTORY': max(args.requests, 500),
+    }
+    if args.sqlite_pragmas == 'off':
+        config['SQLITE_PRAGMAS'] = {}
+    startup_started = time.perf_counter()
+    app = create_app(config)
+    startup_time = time.perf_counter() - startup_started
+
+    seed_started = time.perf_counter()
+    with app.app_context():
+        admin_id = seed_database(args, rng)
+    seed_time = time.perf_counter() - seed_started
+
+    scenarios = {}
+    for name, make_request in build_scenarios(app, rng, admin_id, args.requests):
+        scenarios[name] = run_scenario(make_request, args.requests)
+        print(f"{name:20} p50 {scenarios[name]['p50_ms']} мс, p95 {scenarios[name]['p95_ms']} мс, "
+              f"{scenarios[name]['rps']} rps, SQL/запит {scenarios[name]['queries_per_request']}")
+
+    with app.app_context():
+        paths = ['/', '/news'] + [f'/news/{row.id}' for row in db.session.query(News.id).limit(100)] + \
+                [f'/page/{row.slug}' for row in db.session.query(MenuItem.slug).limit(100)]
+    load = run_load(app, paths, args.threads, args.duration, args.server, args.slow_clients)
+    print(f"Навантаження ({args.server}): {load['rps']} rps, p95 {load['p95_ms']} мс, помилок {load['errors']}")
+
+    contention = run_contention(app, args.threads, args.duration, args.content_size, rng)
+    print(f"Читання під час запису: {contention['reads']['per_second']}/с, p95 {contention['reads']['p95_ms']} мс, "
+          f"помилок {contention['reads']['errors']}; запис: {contention['writes']['per_second']}/с, "
+          f"p95 {contention['writes']['p95_ms']} мс, помилок {contention['writes']['errors']}")
+
+    result = {
+        'meta': {
+            'commit': _git_commit(),
+            'timestamp': datetime.utcnow().isoformat() + 'Z',
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'params': vars(args),
+            'seed_seconds': round(seed_time, 2),
+            'startup_ms': round(startup_time * 1000, 1),
+        },
+        'scenarios': scenarios,
+        'load': load,
+        'contention': contention,
+        # ru_maxrss у Linux — кілобайти
+        'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f'Результати збережено у {args.output}')
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            regressions = compare(json.load(f), result, args.fail_threshold)
+        if regressions:
+            print('Регресії p95: ' + ', '.join(regressions))
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
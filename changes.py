@@ -0,0 +1,105 @@
+import threading
+import time
+from collections import defaultdict
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, select, update
+from sqlalchemy.orm import Session
+
+from db import CacheVersion
+
+# Таблиці, зміни в яких мають побачити всі процеси, а не лише той, що зробив коміт
+SHARED_TABLES = ('news', 'menu_items', 'users')
+
+
+def on_commit(app, table_name, callback):
+    # Колбеки зберігаються в самому застосунку, тож коміт в одному екземплярі не чіпає кешів іншого
+    # і колбеки зникають разом із застосунком
+    listeners = app.extensions.setdefault('changes', defaultdict(list))
+    listeners[table_name].append(callback)
+
+
+def _mark(session, table_name):
+    changed = session.info.setdefault('changed_tables', set())
+    if table_name in changed:
+        return
+    changed.add(table_name)
+    if table_name in SHARED_TABLES:
+        # Лічильник зростає в тій самій транзакції, тож відкат скасовує і його
+        table = CacheVersion.__table__
+        session.connection().execute(update(table).where(table.c.name == table_name)
+                                     .values(version=table.c.version + 1))
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_flushed(session, flush_context):
+    # У after_flush списки new/dirty/deleted ще містять стан до flush
+    for obj in list(session.new) + list(session.deleted):
+        _mark(session, obj.__table__.name)
+    for obj in session.dirty:
+        if session.is_modified(obj):
+            _mark(session, obj.__table__.name)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _collect_statements(state):
+    # Масові insert()/update()/delete() минають flush, тому відстежуємо їх окремо
+    if state.is_insert or state.is_update or state.is_delete:
+        table = getattr(state.statement, 'table', None)
+        if table is not None:
+            _mark(state.session, table.name)
+
+
+def notify(app, table_name):
+    # Для змін, про які процес дізнався не з власного коміту (наприклад, інший воркер)
+    for callback in app.extensions.get('changes', {}).get(table_name, ()):
+        callback()
+
+
+@event.listens_for(Session, 'after_commit')
+def _notify(session):
+    changed = session.info.pop('changed_tables', ())
+    # Сесія Flask-SQLAlchemy живе в контексті застосунку, якому належить; поза ним колбеків немає
+    if not changed or not has_app_context():
+        return
+    app = current_app._get_current_object()
+    for table_name in changed:
+        notify(app, table_name)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard(session):
+    session.info.pop('changed_tables', None)
+
+
+class VersionWatcher:
+    # Не частіше ніж раз на interval секунд читає лічильники cache_versions і скидає кеші
+    # таблиць, які змінив інший процес. Власні коміти теж помітні тут — кеш скидається вдруге, це дешево.
+
+    def __init__(self, app, interval=1.0):
+        self.app = app
+        self.interval = interval
+        self._seen = None
+        self._checked_at = float('-inf')
+        self._lock = threading.Lock()
+
+    def due(self):
+        return time.monotonic() - self._checked_at >= self.interval
+
+    def statement(self):
+        return select(CacheVersion.name, CacheVersion.version)
+
+    def apply(self, rows):
+        current = {name: version for name, version in rows}
+        with self._lock:
+            self._checked_at = time.monotonic()
+            seen, self._seen = self._seen, current
+        if seen is None:
+            return
+        for name, version in current.items():
+            if seen.get(name) != version:
+                notify(self.app, name)
+
+    def check(self, session):
+        if self.due():
+            self.apply(session.execute(self.statement()).all())
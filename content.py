@@ -0,0 +1,166 @@
+import html
+import json
+import re
+from html.parser import HTMLParser
+
+EXCERPT_LENGTH = 300
+
+
+class _TextExtractor(HTMLParser):
+    # Збирає текст з HTML редактора, пропускаючи script та style
+
+    SKIP_TAGS = {'script', 'style'}
+    BLOCK_TAGS = {'p', 'div', 'br', 'li', 'tr', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'blockquote'}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self._skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self._skip += 1
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append(' ')
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS and self._skip:
+            self._skip -= 1
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append(' ')
+
+    def handle_data(self, data):
+        if not self._skip:
+            self.parts.append(data)
+
+
+def html_to_text(value):
+    if not value:
+        return ''
+    parser = _TextExtractor()
+    parser.feed(value)
+    parser.close()
+    return re.sub(r'\s+', ' ', ''.join(parser.parts)).strip()
+
+
+def make_excerpt(value, length=EXCERPT_LENGTH):
+    return _truncate(html_to_text(value), length)
+
+
+def _truncate(text, length):
+    if len(text) <= length:
+        return text
+    cut = text[:length].rsplit(' ', 1)[0] or text[:length]
+    return cut.rstrip(' ,.;:—-') + '…'
+
+
+# Дозволені теги та атрибути HTML з редактора; усе інше відкидається під час збереження
+ALLOWED_TAGS = {
+    'p', 'br', 'hr', 'div', 'span', 'b', 'strong', 'i', 'em', 'u', 's', 'strike', 'sub', 'sup', 'small',
+    'a', 'img', 'figure', 'figcaption', 'ul', 'ol', 'li', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+    'blockquote', 'pre', 'code', 'table', 'caption', 'thead', 'tbody', 'tfoot', 'tr', 'th', 'td', 'iframe',
+}
+VOID_TAGS = {'br', 'hr', 'img'}
+ALLOWED_ATTRS = {
+    '*': {'class', 'style', 'title', 'align'},
+    'a': {'href', 'target', 'rel'},
+    'img': {'src', 'alt', 'width', 'height'},
+    'td': {'colspan', 'rowspan'},
+    'th': {'colspan', 'rowspan'},
+    'iframe': {'src', 'width', 'height', 'allowfullscreen', 'frameborder'},
+}
+URL_ATTRS = {'href', 'src'}
+ALLOWED_SCHEMES = ('http://', 'https://', 'mailto:', 'tel:', '/', '#')
+# Вбудовувати можна лише відео з YouTube
+IFRAME_PREFIXES = ('https://www.youtube.com/embed/', 'https://www.youtube-nocookie.com/embed/')
+UPLOAD_PREFIXES = ('/static/uploads/',)
+# Браузери викидають з URL табуляції й переноси та читають '\' як '/', тож '/\evil.com' — це //evil.com
+URL_IGNORED_CHARS = re.compile(r'[\t\n\r]')
+PROTOCOL_RELATIVE = re.compile(r'^[/\\]{2}')
+
+
+class _ContentParser(_TextExtractor):
+    # За один прохід: очищений HTML, текст та список завантажених зображень
+
+    def __init__(self):
+        super().__init__()
+        self.html = []
+        self.images = []
+        self._open = []
+
+    def _clean_attrs(self, tag, attrs):
+        allowed = ALLOWED_ATTRS['*'] | ALLOWED_ATTRS.get(tag, set())
+        cleaned = []
+        for name, value in attrs:
+            value = value or ''
+            if name not in allowed:
+                continue
+            if name in URL_ATTRS:
+                url = URL_IGNORED_CHARS.sub('', value.strip())
+                prefixes = IFRAME_PREFIXES if tag == 'iframe' else ALLOWED_SCHEMES
+                if not url.lower().startswith(prefixes) or PROTOCOL_RELATIVE.match(url):
+                    continue
+                value = url
+            if name == 'style' and re.search(r'url\s*\(|expression\s*\(|javascript:', value, re.I):
+                continue
+            cleaned.append((name, value))
+        return cleaned
+
+    def _write_tag(self, tag, attrs):
+        rendered = ''.join(f' {name}="{html.escape(value, quote=True)}"' for name, value in attrs)
+        self.html.append(f'<{tag}{rendered}>')
+
+    def handle_starttag(self, tag, attrs):
+        super().handle_starttag(tag, attrs)
+        if tag not in ALLOWED_TAGS or self._skip:
+            return
+        attrs = self._clean_attrs(tag, attrs)
+        if tag == 'iframe' and not any(name == 'src' for name, _ in attrs):
+            return
+        if tag == 'img':
+            src = dict(attrs).get('src', '')
+            if src.startswith(UPLOAD_PREFIXES):
+                self.images.append(src.rsplit('/', 1)[1])
+        self._write_tag(tag, attrs)
+        if tag not in VOID_TAGS:
+            self._open.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS and self._open and self._open[-1] == tag:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        super().handle_endtag(tag)
+        if tag in self._open:
+            # Закриваємо й теги, які редактор залишив незакритими всередині
+            while self._open:
+                open_tag = self._open.pop()
+                self.html.append(f'</{open_tag}>')
+                if open_tag == tag:
+                    break
+
+    def handle_data(self, data):
+        super().handle_data(data)
+        if not self._skip:
+            self.html.append(html.escape(data, quote=False))
+
+    def close(self):
+        super().close()
+        while self._open:
+            self.html.append(f'</{self._open.pop()}>')
+
+
+def render_content(value):
+    # Похідні поля, які обчислюються один раз під час збереження
+    parser = _ContentParser()
+    if value:
+        parser.feed(value)
+    parser.close()
+    text = re.sub(r'\s+', ' ', ''.join(parser.parts)).strip()
+    return {
+        'content_html': ''.join(parser.html),
+        'excerpt': _truncate(text, EXCERPT_LENGTH),
+        'word_count': len(re.findall(r'\w+', text)),
+        'images': json.dumps(list(dict.fromkeys(parser.images))),
+    }
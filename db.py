@@ -1,8 +1,13 @@
 from flask_sqlalchemy import SQLAlchemy
-from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.security import generate_password_hash
 from datetime import datetime
 from flask_login import UserMixin
 
+from sqlalchemy import event, inspect, text
+
+from auth_guard import verify_password
+from content import render_content
+
 db = SQLAlchemy()
 
 class User(UserMixin, db.Model):
@@ -17,11 +22,17 @@ class User(UserMixin, db.Model):
         self.password_hash = generate_password_hash(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        # Перевірка виконується в пулі процесів, якщо його налаштовано (див. auth_guard)
+        return verify_password(self.password_hash, password)
 
     def __repr__(self):
         return f'<User {self.username}>'
 
+# Стан новини: заплановані стають опублікованими, коли настає publish_at (див. scheduler.py)
+NEWS_PUBLISHED = 'published'
+NEWS_SCHEDULED = 'scheduled'
+
+
 class News(db.Model):
     __tablename__ = 'news'
 
@@ -29,7 +40,23 @@ class News(db.Model):
     title = db.Column(db.String(255), nullable=False)
     image = db.Column(db.String(255), nullable=True)  # Назва файлу зображення в /static/uploads
     content = db.Column(db.Text, nullable=True)
+    # Похідні від content поля, обчислюються під час збереження (див. _fill_derived_content)
+    content_html = db.Column(db.Text, nullable=True)  # Очищений HTML для шаблонів
+    excerpt = db.Column(db.String(500), nullable=True)  # Короткий текст без HTML для списків новин
+    word_count = db.Column(db.Integer, nullable=True)
+    images = db.Column(db.Text, nullable=True)  # JSON-список файлів з /static/uploads, згаданих у тексті
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    status = db.Column(db.String(16), nullable=False, default=NEWS_PUBLISHED)
+    publish_at = db.Column(db.DateTime, nullable=True)  # UTC; для запланованих — час публікації
+
+    __table_args__ = (
+        # Індекс для посторінкового (keyset) виводу новин від найновіших
+        db.Index('ix_news_created_at_id', 'created_at', 'id'),
+        # Публічні списки та останні новини — лише опубліковані, без сортування
+        db.Index('ix_news_status_created_at_id', 'status', 'created_at', 'id'),
+        # Планувальник шукає заплановані новини, час яких настав
+        db.Index('ix_news_status_publish_at', 'status', 'publish_at'),
+    )
 
     def __repr__(self):
         return f'<News {self.title}>'
@@ -45,194 +72,95 @@ class MenuItem(db.Model):
                      nullable=False)  # коротка назва для ідентифікації (типу school, student)
     parent_id = db.Column(db.Integer, db.ForeignKey('menu_items.id'), nullable=True)
     content = db.Column(db.Text, nullable=True)
+    content_html = db.Column(db.Text, nullable=True)
+    excerpt = db.Column(db.String(500), nullable=True)
+    word_count = db.Column(db.Integer, nullable=True)
+    images = db.Column(db.Text, nullable=True)
+    # Матеріалізований шлях з id предків, напр. '000001/000024/'; піддерево — діапазон по path
+    path = db.Column(db.String(255), nullable=True)
+    depth = db.Column(db.Integer, nullable=False, default=0)
+    position = db.Column(db.Integer, nullable=False, default=0)  # порядок серед сусідів
 
     parent = db.relationship('MenuItem', remote_side=[id], backref='submenu')
 
+    __table_args__ = (
+        db.Index('ix_menu_items_path', 'path'),
+        db.Index('ix_menu_items_parent_position', 'parent_id', 'position'),
+    )
+
     def __repr__(self):
         return f'<MenuItem {self.title}>'
 
 
+class CacheVersion(db.Model):
+    # Лічильник змін таблиці; кожен процес порівнює його зі своїм і скидає власні кеші (див. changes.py)
+    __tablename__ = 'cache_versions'
+
+    name = db.Column(db.String(64), primary_key=True)  # назва таблиці
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+
+@event.listens_for(News, 'before_insert')
+@event.listens_for(News, 'before_update')
+@event.listens_for(MenuItem, 'before_insert')
+@event.listens_for(MenuItem, 'before_update')
+def _fill_derived_content(mapper, connection, target):
+    # Очищення HTML, уривок і т.д. рахуються один раз при записі, а не при кожному перегляді
+    state = inspect(target)
+    if state.persistent and not state.attrs.content.history.has_changes() and target.content_html is not None:
+        return
+    for name, value in render_content(target.content).items():
+        setattr(target, name, value)
 
 
 
-def init_db(app):
-    with app.app_context():
-        db.create_all()
-
-        if not User.query.filter_by(username='admin').first():
-            admin = User(username='admin', is_admin=True)
-            admin.set_password('admin')
-            db.session.add(admin)
-            db.session.commit()
-
-        if not News.query.first():
-            sample_news = [
-                News(
-                    title='26 квітня — 39-та річниця Чорнобильської трагедії',
-                    image='chernobyl.jpg',
-                    content='Пам’ятаємо. Шануємо. Вічна слава героям Чорнобиля.'
-                ),
-                News(
-                    title='До уваги батьків майбутніх першокласників!',
-                    image='schoolkids.jpg',
-                    content='Оголошено набір у перші класи на 2025-2026 навчальний рік.'
-                ),
-                News(
-                    title='Лекторій «Тайм-менеджмент у професійній діяльності педагога»',
-                    image='lecture.jpg',
-                    content='Педагоги школи пройшли тренінг із сучасного планування робочого часу.'
-                )
-            ]
-            db.session.add_all(sample_news)
-            db.session.commit()
-
-        if not MenuItem.query.first():
-            # Ініціалізація головних пунктів меню
-            school = MenuItem(title='ПРО ШКОЛУ', url='#', slug='pro-shkolu')
-            enrollment = MenuItem(title='Зарахування до закладу освіти', url='#', slug='zarahuvannya')
-            news = MenuItem(title='Новини', url='#', slug='novyny')
-            contacts = MenuItem(title='Контакти', url='#', slug='kontakty')
-            education_law = MenuItem(title='Виконання вимог ст.30 Закону України "Про освіту"', url='#',
-                                     slug='pro-osvitu')
-            state_control = MenuItem(title='Результати державного контролю', url='#', slug='derzhkontrol')
-            education_process = MenuItem(title='Освітній процес', url='#', slug='osvitnij-proces')
-            together_loss = MenuItem(title='Долаємо освітні втрати разом', url='#', slug='dolajemo-vtraty')
-            hmt2025 = MenuItem(title='НМТ - 2025', url='#', slug='nmt-2025')
-            healthy_eating = MenuItem(title='Здорове харчування', url='#', slug='zdorove-harchuvannya')
-            distance_learning = MenuItem(title='Дистанційне навчання', url='#', slug='distancijne-navchannya')
-            bullying = MenuItem(title='Актуальне: Булінг', url='#', slug='buling')
-            upbringing = MenuItem(title='Виховна робота', url='#', slug='vykhovna-robota')
-            self_government = MenuItem(title='Учнівське самоврядування', url='#', slug='samospravy')
-            vacations = MenuItem(title='Канікули', url='#', slug='kanikuly')
-            psychological_service = MenuItem(title='Психологічна служба', url='#', slug='psyhologichna-sluzhba')
-            gender_equality = MenuItem(title='Гендерна рівність', url='#', slug='gender-equality')
-            safe_environment = MenuItem(title='Безпечне освітнє середовище', url='#', slug='safe-environment')
-            library = MenuItem(title='Шкільна бібліотека', url='#', slug='library')
-            finance = MenuItem(title='Фінансова діяльність', url='#', slug='finansy')
-            energy_saving = MenuItem(title='Енергозбереження', url='#', slug='energozberezhennya')
-            questions = MenuItem(title='Запитуйте - відповімо', url='#', slug='faq')
-            calendar = MenuItem(title='Календар', url='#', slug='calendar')
-
-            db.session.add_all([
-                school, enrollment, news, contacts, education_law, state_control,
-                education_process, together_loss, hmt2025, healthy_eating, distance_learning,
-                bullying, upbringing, self_government, vacations, psychological_service,
-                gender_equality, safe_environment, library, finance, energy_saving, questions, calendar
-            ])
-            db.session.commit()
-
-            # Додаємо підпункти
-            submenus = [
-                # ПРО ШКОЛУ
-                ('Територія обслуговування школи', school.id),
-                ('Візитка школи, Мережа класів', school.id),
-                ('Структура та органи управління закладу освіти', school.id),
-                ('Кадровий склад', school.id),
-                ('Атестація педагогічних працівників', school.id),
-                ('Правила поведінки учасників освітнього процесу', school.id),
-                ('Матеріально-технічне забезпечення', school.id),
-                ('Вимоги до навчального кабінету', school.id),
-                ('Шкільна кінопанорама', school.id),
-                ('Історія школи', school.id),
-                ('Галерея', school.id),
-                ('Незабутні шкільні роки (2017-2018)', school.id),
-
-                # Зарахування
-                ('Зарахування до 1 класу', enrollment.id),
-
-                # Виконання вимог закону
-                ('Положення про внутрішню систему забезпечення якості освіти', education_law.id),
-                ('Положення про академічну доброчесність', education_law.id),
-                ('Індивідуальна форма навчання', education_law.id),
-                ('Організація інклюзивного навчання', education_law.id),
-                ('Вакансії', education_law.id),
-                ('Робота зі зверненнями громадян', education_law.id),
-                ('Звіт про діяльність закладу освіти', education_law.id),
-                ('Звіт керівника', education_law.id),
-
-                # Освітній процес
-                ('Режим роботи', education_process.id),
-                ('Розклад уроків', education_process.id),
-                ('Освітні програми', education_process.id),
-                ('Освітні компоненти', education_process.id),
-                ('Критерії оцінювання навчальних досягнень учнів', education_process.id),
-                ('Нова українська школа', education_process.id),
-                ('На допомогу вчителю НУШ', education_process.id),
-                ('Методична робота школи І ступеня', education_process.id),
-                ('Новий освітній простір', education_process.id),
-                ('Методична робота', education_process.id),
-                ('Професійна рада', education_process.id),
-                ('Предметні тижні', education_process.id),
-                ('Сайти, блоги вчителів', education_process.id),
-                ('Робота з талановитою молоддю', education_process.id),
-                ('Результати моніторингу якості освіти', education_process.id),
-
-                # Здорове харчування
-                ('Батькам про здорове харчування', healthy_eating.id),
-                ('Учням про здорове харчування', healthy_eating.id),
-
-                # Булінг
-                ('Нормативно-правова база з питань булінгу', bullying.id),
-                ('Права та обов\'язки учня', bullying.id),
-                ('Правила поведінки здобувачів освіти', bullying.id),
-                ('План заходів проти булінгу', bullying.id),
-                ('Порядок подання та розгляду заяв', bullying.id),
-                ('Порядок реагування на випадки булінгу', bullying.id),
-                ('Відповідальні особи', bullying.id),
-                ('Телефони довіри', bullying.id),
-                ('Корисні поради', bullying.id),
-                ('Поради учням', bullying.id),
-                ('Поради батькам', bullying.id),
-                ('Поради вчителям', bullying.id),
-                ('Інформаційні матеріали', bullying.id),
-                ('Всеукраїнська акція "16 днів проти насильства"', bullying.id),
-
-                # Виховна робота
-                ('Нормативно-правове забезпечення виховної роботи', upbringing.id),
-                ('Система виховної роботи', upbringing.id),
-                ('Класному керівнику', upbringing.id),
-                ('Патріотичне виховання', upbringing.id),
-                ('Рій "Краяни"', upbringing.id),
-                ('КНИГА ЗВІТІВ рою "Краяни"', upbringing.id),
-                ('Профілактика правопорушень та злочинності', upbringing.id),
-                ('Робота з батьками', upbringing.id),
-                ('Профорієнтаційна робота', upbringing.id),
-
-                # Психологічна служба
-                ('Національна дитяча гаряча лінія', psychological_service.id),
-                ('Всеукраїнська програма ментального здоров\'я "Ти як?"', psychological_service.id),
-
-                # Безпечне освітнє середовище
-                ('Безпека життєдіяльності', safe_environment.id),
-                ('Безпека дорожнього руху', safe_environment.id),
-                ('Безпека в Інтернеті', safe_environment.id),
-                ('Про протидію онлайн шахрайствам', safe_environment.id),
-                ('Цивільний захист', safe_environment.id),
-                ('Платформа МРІЯ', safe_environment.id),
-                ('БРАМА - онлайн варта України', safe_environment.id),
-
-                # Бібліотека
-                ('Електронні підручники', library.id),
-                ('Місячник шкільної бібліотеки', library.id),
-                ('Конкурсний відбір проєктів учнів', library.id),
-                ('Виховна робота бібліотеки', library.id),
-                ('Новинки літератури', library.id),
-                ('Літературні виставки', library.id),
-                ('Медіатека', library.id),
-                ('Букстейлери', library.id),
-                ('Що читати учням влітку', library.id),
-
-                # Фінансова діяльність
-                ('Кошторис', finance.id),
-                ('Капітальні ремонти', finance.id),
-                ('Предмети закупівлі', finance.id)
-            ]
-
-            db.session.add_all([MenuItem(title=title, url='#',
-                                         slug=title.lower().replace(' ', '-').replace('"', '').replace('\'', ''),
-                                         parent_id=parent_id) for title, parent_id in submenus])
-            db.session.commit()
 
 
+# Налаштування кожного нового з'єднання SQLite: WAL дозволяє читати під час запису адміністратора
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,  # від'ємне значення — у кілобайтах
+    'busy_timeout': 5000,
+}
+
+
+def engine_options(uri, pool_size=5, max_overflow=10, pool_timeout=30):
+    if uri in ('sqlite://', 'sqlite:///:memory:'):
+        # База в пам'яті живе в одному з'єднанні, Flask-SQLAlchemy сам налаштовує для неї пул
+        return {}
+    options = {'pool_size': pool_size, 'max_overflow': max_overflow, 'pool_timeout': pool_timeout}
+    if uri.startswith('sqlite'):
+        # З'єднання з пулу використовуються різними потоками воркера
+        options['connect_args'] = {'check_same_thread': False}
+    else:
+        options['pool_pre_ping'] = True
+        options['pool_recycle'] = 1800
+    return options
+
+
+def apply_sqlite_pragmas(engine, pragmas=SQLITE_PRAGMAS):
+    # Для асинхронного двигуна передається engine.sync_engine; адаптер aiosqlite має той самий cursor()
+    if engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+        cursor.close()
+
+
+def configure_engine(app):
+    with app.app_context():
+        engine = db.engine
+    apply_sqlite_pragmas(engine, app.config.get('SQLITE_PRAGMAS', SQLITE_PRAGMAS))
 
 
+def sync_id_sequence(connection, table_name):
+    # Після вставки з явними id лічильник PostgreSQL треба підтягнути до max(id)
+    if connection.dialect.name == 'postgresql':
+        connection.execute(text(f"SELECT setval(pg_get_serial_sequence('{table_name}', 'id'), "
+                                f"COALESCE((SELECT MAX(id) FROM {table_name}), 1))"))
@@ -0,0 +1,150 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import quote, unquote
+
+from db import db, News, MenuItem, NEWS_PUBLISHED
+from news import NEWS_PER_PAGE, NewsSnapshot
+
+MANIFEST_NAME = '.export-manifest.json'
+
+_worker_client = None
+
+
+def _hash(*parts):
+    digest = hashlib.sha1()
+    for part in parts:
+        digest.update(repr(part).encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def _templates_hash(template_folder):
+    # Шаблони успадковують один одного, тож зміна будь-якого з них перерендерює всі сторінки
+    parts = []
+    for root, _, files in os.walk(template_folder):
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            with open(path, 'rb') as f:
+                parts.append((os.path.relpath(path, template_folder), hashlib.sha1(f.read()).hexdigest()))
+    return _hash(*sorted(parts))
+
+
+def page_url(slug):
+    # slug стає окремою текою out/page/<slug>/; такі, що виходять за її межі чи ламають URL, не експортуються
+    if not slug or slug in ('.', '..') or any(char in slug for char in '/\\?#'):
+        return None
+    return '/page/' + quote(slug, safe='')
+
+
+def page_dependencies(app, skipped=None):
+    # Хеш залежностей для кожної публічної URL-адреси: рядки News/MenuItem, які сторінка показує, та шаблони
+    news_rows = db.session.query(News.id, News.title, News.image, News.content, News.content_html,
+                                 News.excerpt, News.created_at).filter(News.status == NEWS_PUBLISHED) \
+        .order_by(News.created_at.desc(), News.id.desc()).all()
+    menu_rows = db.session.query(MenuItem.id, MenuItem.title, MenuItem.url, MenuItem.slug, MenuItem.parent_id,
+                                 MenuItem.position, MenuItem.content_html).order_by(MenuItem.id).all()
+
+    # Меню та блок останніх новин є на кожній сторінці; для блоку хешуємо ті самі поля,
+    # які бачать шаблони через LatestNewsCache
+    latest = app.extensions['latest_news_cache'].limit
+    shared = _hash(
+        _templates_hash(os.path.join(app.root_path, app.template_folder or 'templates')),
+        [(row.id, row.title, row.url, row.slug, row.parent_id, row.position) for row in menu_rows],
+        [tuple(getattr(row, field) for field in NewsSnapshot._fields) for row in news_rows[:latest]],
+    )
+
+    per_page = app.config.get('NEWS_PER_PAGE', NEWS_PER_PAGE)
+    pages = {
+        '/': shared,
+        '/news': _hash(shared, [(row.id, row.title, row.image, row.excerpt, row.created_at)
+                                for row in news_rows[:per_page]]),
+    }
+    for row in news_rows:
+        pages[f'/news/{row.id}'] = _hash(shared, tuple(row))
+    for row in menu_rows:
+        url = page_url(row.slug)
+        if url is None:
+            if skipped is not None:
+                skipped.append(row.slug)
+            continue
+        pages[url] = _hash(shared, row.title, row.content_html)
+    return pages
+
+
+def output_path(out_dir, url):
+    # /news/5 -> news/5/index.html, щоб nginx віддавав через try_files $uri/index.html.
+    # nginx шукає файл за розкодованим $uri, тож теки називаються розкодованими сегментами.
+    segments = [unquote(segment) for segment in url.strip('/').split('/')] if url.strip('/') else []
+    if any(segment in ('', '.', '..') or '/' in segment or '\\' in segment for segment in segments):
+        raise ValueError(f'Адреса виходить за межі теки експорту: {url}')
+    return os.path.join(out_dir, *segments, 'index.html')
+
+
+def _init_worker(config):
+    global _worker_client
+    from main import create_app
+    _worker_client = create_app(config).test_client()
+
+
+def _render(url, target):
+    response = _worker_client.get(url)
+    if response.status_code != 200:
+        return url, response.status_code
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    tmp_path = target + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(response.get_data())
+    os.replace(tmp_path, target)
+    return url, 200
+
+
+def export_static(app, out_dir, jobs=4, full=False, echo=print):
+    manifest_path = os.path.join(out_dir, MANIFEST_NAME)
+    previous = {}
+    if not full:
+        try:
+            with open(manifest_path, encoding='utf-8') as f:
+                previous = json.load(f)
+        except (OSError, ValueError):
+            previous = {}
+
+    skipped = []
+    with app.app_context():
+        current = page_dependencies(app, skipped)
+
+    changed = [url for url, digest in current.items() if previous.get(url) != digest]
+    removed = [url for url in previous if url not in current]
+
+    for url in removed:
+        try:
+            os.remove(output_path(out_dir, url))
+        except (FileNotFoundError, ValueError):
+            # ValueError — небезпечна адреса зі старого маніфесту, її файл не чіпаємо
+            pass
+
+    # Воркери рендерять свіжі дані, тож кеш сторінок та інструментування їм не потрібні
+    config = {'SQLALCHEMY_DATABASE_URI': app.config['SQLALCHEMY_DATABASE_URI'],
+              'PAGE_CACHE_ENABLED': False, 'PERF_ENABLED': False, 'NEWS_SCHEDULER_ENABLED': False}
+    failed = {}
+    if changed:
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(config,)) as pool:
+            futures = [pool.submit(_render, url, output_path(out_dir, url)) for url in changed]
+            for future in futures:
+                url, status = future.result()
+                if status != 200:
+                    failed[url] = status
+
+    manifest = {url: digest for url, digest in current.items() if url not in failed}
+    os.makedirs(out_dir, exist_ok=True)
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=0, sort_keys=True)
+
+    echo(f'Сторінок: {len(current)}, перерендерено: {len(changed) - len(failed)}, '
+         f'видалено: {len(removed)}, з помилкою: {len(failed)}')
+    for url, status in sorted(failed.items()):
+        echo(f'  {url}: HTTP {status}')
+    for slug in skipped:
+        echo(f'  пропущено пункт меню зі slug {slug!r}: він не може бути окремою сторінкою')
+    return changed, removed, failed
@@ -0,0 +1,64 @@
+import threading
+import time
+from collections import OrderedDict
+
+from flask_login import UserMixin
+
+from changes import on_commit
+from db import db, User
+
+# Публічні сторінки, на яких не потрібні ні сесія користувача, ні його запис у БД
+PUBLIC_ENDPOINTS = {'index', 'all_news', 'news_feed', 'view_news', 'view_menu_page', 'search_page', 'static'}
+
+
+class UserIdentity(UserMixin):
+    # Легкий знімок користувача для current_user, не прив'язаний до сесії БД
+
+    def __init__(self, id, username, is_admin):
+        self.id = id
+        self.username = username
+        self.is_admin = bool(is_admin)
+
+    def __repr__(self):
+        return f'<UserIdentity {self.username}>'
+
+
+class UserCache:
+    # Кеш ідентичностей за id з обмеженим часом життя.
+    # Увесь кеш скидається після коміту будь-якої зміни в users — у цьому процесі одразу,
+    # в інших воркерах через лічильник cache_versions; користувачів мало, тож це дешево.
+
+    def __init__(self, app, ttl=60, max_entries=1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+        on_commit(app, User.__tablename__, self.clear)
+
+    def get(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(user_id)
+                return entry[1]
+            generation = self._generation
+
+        row = db.session.query(User.id, User.username, User.is_admin).filter_by(id=user_id).first()
+        identity = UserIdentity(*row) if row else None
+        with self._lock:
+            if identity is None:
+                self._entries.pop(user_id, None)
+            elif generation == self._generation:
+                # Якщо кеш скинули, поки йшов запит, прочитаний рядок міг застаріти — тоді не зберігаємо
+                self._entries[user_id] = (now + self.ttl, identity)
+                self._entries.move_to_end(user_id)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return identity
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
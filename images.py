@@ -0,0 +1,151 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import url_for
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow не встановлено — зображення віддаються як є
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+# Назва варіанта -> максимальна ширина в пікселях
+VARIANTS = {'thumb': 320, 'card': 640, 'full': 1600}
+VARIANTS_DIR = 'variants'
+# Більші зображення не декодуємо: розпакований растр займав би сотні мегабайт
+MAX_PIXELS = 40_000_000
+
+if Image is not None:
+    Image.MAX_IMAGE_PIXELS = MAX_PIXELS
+
+
+class ImageProcessor:
+    # Фонова генерація зменшених копій та WebP для завантажених зображень.
+    # Пул потоків обмежений, а черга — max_pending завданнями, тож запит на завантаження не чекає.
+
+    def __init__(self, upload_folder, max_workers=2, max_pending=32, max_manifests=1024, miss_ttl=30):
+        self.upload_folder = upload_folder
+        self.variants_folder = os.path.join(upload_folder, VARIANTS_DIR)
+        self.max_manifests = max_manifests
+        self.miss_ttl = miss_ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='images')
+        self._slots = threading.BoundedSemaphore(max_pending)
+        # filename -> (діє до, маніфест або None); LRU, щоб не рости з кожним зображенням на сайті
+        self._manifests = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(self.variants_folder, exist_ok=True)
+
+    def submit(self, filename):
+        if Image is None:
+            return False
+        if not self._slots.acquire(blocking=False):
+            logger.warning('Черга обробки зображень переповнена, пропускаємо %s', filename)
+            return False
+        future = self._executor.submit(self._process, filename)
+        future.add_done_callback(lambda _: self._slots.release())
+        return True
+
+    def manifest(self, filename):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._manifests.get(filename)
+            if entry and entry[0] > now:
+                self._manifests.move_to_end(filename)
+                return entry[1]
+
+        try:
+            with open(self._manifest_path(filename), encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            # Промах теж кешуємо, але ненадовго: варіанти може дописати інший воркер
+            self._remember(filename, None, now + self.miss_ttl)
+            return None
+        self._remember(filename, manifest)
+        return manifest
+
+    def _remember(self, filename, manifest, expires=float('inf')):
+        with self._lock:
+            self._manifests[filename] = (expires, manifest)
+            self._manifests.move_to_end(filename)
+            while len(self._manifests) > self.max_manifests:
+                self._manifests.popitem(last=False)
+
+    def _manifest_path(self, filename):
+        return os.path.join(self.variants_folder, filename + '.json')
+
+    def _process(self, filename):
+        try:
+            manifest = self._render_variants(filename)
+        except Exception:
+            logger.exception('Не вдалося обробити зображення %s', filename)
+            return
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.variants_folder, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, self._manifest_path(filename))
+        self._remember(filename, manifest)
+
+    def _render_variants(self, filename):
+        stem, ext = os.path.splitext(filename)
+        with Image.open(os.path.join(self.upload_folder, filename)) as source:
+            # Pillow лише попереджає до 2 * MAX_IMAGE_PIXELS, тому перевіряємо розмір до декодування
+            if source.width * source.height > MAX_PIXELS:
+                raise ValueError(f'Зображення {filename} завелике: {source.width}x{source.height}')
+            image = ImageOps.exif_transpose(source)
+            has_alpha = image.mode in ('RGBA', 'LA', 'P')
+            if ext.lower() in ('.jpg', '.jpeg') or not has_alpha:
+                save_format, save_ext, save_options = 'JPEG', '.jpg', {'quality': 82, 'optimize': True,
+                                                                       'progressive': True}
+            else:
+                save_format, save_ext, save_options = 'PNG', '.png', {'optimize': True}
+
+            manifest = {'original': filename, 'width': image.width, 'height': image.height, 'variants': {}}
+            widths_done = set()
+            for name, max_width in VARIANTS.items():
+                width = min(max_width, image.width)
+                if width in widths_done:
+                    continue
+                widths_done.add(width)
+
+                resized = image.copy()
+                resized.thumbnail((width, image.height), Image.LANCZOS)
+                if save_format == 'JPEG' and resized.mode != 'RGB':
+                    resized = resized.convert('RGB')
+
+                variant_name = f'{stem}-{name}{save_ext}'
+                webp_name = f'{stem}-{name}.webp'
+                resized.save(os.path.join(self.variants_folder, variant_name), save_format, **save_options)
+                resized.save(os.path.join(self.variants_folder, webp_name), 'WEBP', quality=80, method=4)
+                manifest['variants'][name] = {
+                    'width': resized.width,
+                    'height': resized.height,
+                    'file': f'{VARIANTS_DIR}/{variant_name}',
+                    'webp': f'{VARIANTS_DIR}/{webp_name}',
+                }
+        return manifest
+
+    # Помічники для шаблонів
+
+    def image_url(self, filename, variant='card'):
+        manifest = self.manifest(filename) if filename else None
+        if manifest and variant in manifest['variants']:
+            filename = manifest['variants'][variant]['file']
+        return url_for('static', filename=f'uploads/{filename}')
+
+    def image_srcset(self, filename, webp=False):
+        manifest = self.manifest(filename) if filename else None
+        if not manifest:
+            return ''
+        key = 'webp' if webp else 'file'
+        return ', '.join(
+            f"{url_for('static', filename='uploads/' + variant[key])} {variant['width']}w"
+            for variant in sorted(manifest['variants'].values(), key=lambda v: v['width'])
+        )
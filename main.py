@@ -1,107 +1,318 @@
 import os
 from datetime import datetime
-from flask import Flask, redirect, url_for, render_template, flash, request, abort, jsonify
+import json
+import time
+import click
+from flask import Flask, redirect, url_for, render_template, flash, request, abort, jsonify, Response, \
+    stream_with_context, g
+from jinja2 import TemplateNotFound
+from werkzeug.middleware.proxy_fix import ProxyFix
 from sqlalchemy.orm import joinedload
 
-from db import db, init_db, MenuItem, News
+from db import db, MenuItem, News, NEWS_PUBLISHED, engine_options, configure_engine
+from menu import MenuCache, delete_subtree, generate_slug, move_menu_item, reorder_menu
+from page_cache import make_page_cache
+from changes import VersionWatcher
+from news import news_page, iter_news, LatestNewsCache
+from images import ImageProcessor
+from storage import make_storage
+from search import search, SEARCH_PER_PAGE
+import migrations
+from seed import seed_db
+from menu_io import export_menu, import_menu, load_menu_file, dump_menu_file
+from news_io import import_news, load_news_file, load_news_stream, parse_publish_at, publication_fields
+from scheduler import NewsScheduler
+from perf import PerfMonitor
+from identity import UserCache, PUBLIC_ENDPOINTS
+from assets import AssetPipeline, build_assets
+from export import export_static
+from auth_guard import PasswordVerifier, LoginMetrics, LoginOverloaded, RateLimiter, MemoryBucketStore, \
+    SQLiteBucketStore, configure_password_verifier
 from flask_login import LoginManager, current_user, login_required
 from flask import request
 from flask_login import LoginManager
-from db import User
-from werkzeug.utils import secure_filename
-from unidecode import unidecode
-
-def generate_slug(title):
-    return unidecode(title.lower().replace(' ', '_'))
 
 UPLOAD_FOLDER = 'static/uploads'
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp', 'webp'}
 
-app = Flask(__name__)
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
-
 # Створення папки якщо не існує
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-@app.route('/upload-image', methods=['POST'])
-def upload_image():
-    if 'upload' not in request.files:
-        return jsonify({"error": "No file part"}), 400
-
-    file = request.files['upload']
-    if file.filename == '':
-        return jsonify({"error": "No selected file"}), 400
-
-    if file and allowed_file(file.filename):
-        filename = secure_filename(file.filename)
-        save_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(save_path)
-        file_url = url_for('static', filename=f'uploads/{filename}')
-        return jsonify({"url": file_url})
-
-    return jsonify({"error": "Invalid file type"}), 400
-
 from routes.auth import auth_bp
 
-def create_app():
+def create_app(config=None):
     app = Flask(__name__)
     db_name = "SITE.db"
     app.secret_key = "some_very_secret_string"
 
-    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{db_name}"
+    # DATABASE_URL дозволяє запускати той самий код, наприклад, з PostgreSQL
+    database_uri = os.environ.get('DATABASE_URL', f"sqlite:///{db_name}")
+    if database_uri.startswith('postgres://'):
+        database_uri = 'postgresql://' + database_uri[len('postgres://'):]
+    app.config["SQLALCHEMY_DATABASE_URI"] = database_uri
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
     app.config['MAX_CONTENT_LENGTH'] = 1024 * 1024 * 1024
+    app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+    app.config['STORAGE_BACKEND'] = 'local'
+    # Фонова обробка зображень: кількість потоків і максимальна довжина черги
+    app.config['IMAGE_WORKERS'] = 2
+    app.config['IMAGE_MAX_PENDING'] = 32
+    # Кеш публічних сторінок: 'memory' (окремо в кожному процесі) або 'filesystem' (спільний для воркерів)
+    app.config['PAGE_CACHE_BACKEND'] = os.environ.get('PAGE_CACHE_BACKEND', 'memory')
+    app.config['PAGE_CACHE_DIR'] = os.environ.get('PAGE_CACHE_DIR')
+    app.config['PAGE_CACHE_TTL'] = 300
+    app.config['PAGE_CACHE_MAX_FILES'] = 2048  # межа кількості файлів для 'filesystem'
+    app.config['PAGE_CACHE_ENABLED'] = True
+    # Як часто (с) звіряти лічильники cache_versions, щоб побачити зміни, зроблені іншими воркерами
+    app.config['CACHE_VERSION_INTERVAL'] = 1.0
+    app.config['NEWS_PER_PAGE'] = 20
+    app.config['NEWS_FEED_ENABLED'] = True
+    # Масовий імпорт новин (розмір транзакції) і фонова публікація запланованих новин
+    app.config['NEWS_IMPORT_BATCH_SIZE'] = 500
+    app.config['NEWS_SCHEDULER_ENABLED'] = True
+    app.config['NEWS_SCHEDULER_INTERVAL'] = 30
+    # Інструментування запитів: Server-Timing, /admin/perf та бюджет SQL-запитів для тестів.
+    # Типово вимкнене; Server-Timing отримують лише адміністратори, DEBUG або PERF_SERVER_TIMING.
+    app.config['PERF_ENABLED'] = bool(int(os.environ.get('PERF_ENABLED', 0)))
+    app.config['PERF_SERVER_TIMING'] = False
+    app.config['PERF_HISTORY'] = 500
+    app.config['PERF_QUERY_BUDGET'] = None
+    app.config['PERF_QUERY_BUDGETS'] = {}
+    app.config['PERF_ENFORCE_BUDGET'] = False
+    # Скільки секунд кешувати дані користувача, який увійшов
+    app.config['USER_CACHE_TTL'] = 60
+    # Внутрішня локація nginx для X-Accel-Redirect (наприклад, '/_static'); None — файли віддає Flask.
+    # Для Apache/lighttpd замість цього можна ввімкнути USE_X_SENDFILE.
+    app.config['ASSETS_X_ACCEL_PREFIX'] = os.environ.get('ASSETS_X_ACCEL_PREFIX')
+    # Вхід: перевірка паролів у пулі процесів з обмеженою чергою та ліміти спроб (token bucket)
+    app.config['AUTH_VERIFY_WORKERS'] = 2
+    app.config['AUTH_VERIFY_MAX_PENDING'] = 8
+    app.config['AUTH_VERIFY_TIMEOUT'] = 10
+    app.config['LOGIN_RATE_IP'] = (10, 10)  # (одразу спроб, нових спроб за хвилину)
+    app.config['LOGIN_RATE_USERNAME'] = (5, 5)
+    # 'memory' — окремо в кожному воркері; 'sqlite' — спільний файл LOGIN_RATE_DB для всіх воркерів
+    app.config['LOGIN_RATE_STORE'] = os.environ.get('LOGIN_RATE_STORE', 'memory')
+    app.config['LOGIN_RATE_DB'] = os.environ.get('LOGIN_RATE_DB', 'login_limits.db')
+    # Скільки проксі (nginx) перед застосунком; лише тоді X-Forwarded-* заміняють адресу клієнта.
+    # Без цього за проксі всі клієнти мають одну remote_addr і одне відро лімітів входу.
+    app.config['TRUSTED_PROXIES'] = int(os.environ.get('TRUSTED_PROXIES', 0))
+
+    # Перевизначення налаштувань (тести, бенчмарки)
+    app.config.update(config or {})
+    if app.config['TRUSTED_PROXIES']:
+        proxies = app.config['TRUSTED_PROXIES']
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxies, x_proto=proxies, x_host=proxies)
+    app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", engine_options(
+        app.config["SQLALCHEMY_DATABASE_URI"],
+        pool_size=int(os.environ.get('DB_POOL_SIZE', 5)),
+        max_overflow=int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+        pool_timeout=int(os.environ.get('DB_POOL_TIMEOUT', 30)),
+    ))
 
     db.init_app(app)
+    configure_engine(app)
+
+    perf_monitor = PerfMonitor(app, history=app.config['PERF_HISTORY']) if app.config['PERF_ENABLED'] else None
+    app.extensions['perf_monitor'] = perf_monitor
 
     login_manager = LoginManager()
     login_manager.login_view = 'auth_bp.login'
     login_manager.init_app(app)
 
+    user_cache = UserCache(app, ttl=app.config['USER_CACHE_TTL'])
+    app.extensions['user_cache'] = user_cache
+
     @login_manager.user_loader
     def load_user(user_id):
-        return User.query.get(int(user_id))
-
-    if not os.path.exists(db_name):
-        print("База даних не знайдена. Створюємо нову...")
-        init_db(app)
+        return user_cache.get(int(user_id))
+
+    login_metrics = LoginMetrics()
+    app.extensions['login_metrics'] = login_metrics
+    configure_password_verifier(PasswordVerifier(max_workers=app.config['AUTH_VERIFY_WORKERS'],
+                                                 max_pending=app.config['AUTH_VERIFY_MAX_PENDING'],
+                                                 timeout=app.config['AUTH_VERIFY_TIMEOUT'],
+                                                 metrics=login_metrics))
+    if app.config['LOGIN_RATE_STORE'] == 'sqlite':
+        bucket_store = SQLiteBucketStore(app.config['LOGIN_RATE_DB'])
     else:
-        with app.app_context():
-            db.create_all()
-        init_db(app)
+        bucket_store = MemoryBucketStore()
+    ip_limiter = RateLimiter(bucket_store, *app.config['LOGIN_RATE_IP'])
+    username_limiter = RateLimiter(bucket_store, *app.config['LOGIN_RATE_USERNAME'])
+
+    @app.before_request
+    def throttle_login():
+        if request.endpoint != 'auth_bp.login' or request.method != 'POST':
+            return None
+        g.login_started = time.perf_counter()
+        login_metrics.count('attempts')
+        username = request.form.get('username', '').strip().lower()
+        wait = ip_limiter.acquire(f'ip:{request.remote_addr}')
+        if not wait and username:
+            wait = username_limiter.acquire(f'user:{username}')
+        if wait:
+            login_metrics.count('throttled')
+            return "Забагато спроб входу. Спробуйте пізніше.", 429, {'Retry-After': str(wait)}
+        return None
+
+    @app.after_request
+    def record_login_time(response):
+        if 'login_started' in g:
+            login_metrics.record_request(time.perf_counter() - g.login_started)
+        return response
+
+    @app.errorhandler(LoginOverloaded)
+    def login_overloaded(error):
+        return "Сервер перевантажений спробами входу. Спробуйте за хвилину.", 503, {'Retry-After': '30'}
+
+    @app.before_request
+    def skip_user_loading():
+        # Публічні сторінки однакові для всіх: користувача з сесії не завантажуємо
+        if request.endpoint in PUBLIC_ENDPOINTS:
+            g._login_user = login_manager.anonymous_user()
+
+    # Схема та початкові дані створюються окремими командами, а не під час імпорту застосунку:
+    #   flask --app main db-init     — міграції + наповнення
+    #   flask --app main db-upgrade  — лише міграції
+    #   flask --app main db-seed     — лише наповнення
+    @app.cli.command('db-upgrade')
+    def db_upgrade_command():
+        version = migrations.upgrade()
+        print(f"Версія схеми: {version}")
+
+    @app.cli.command('db-seed')
+    def db_seed_command():
+        seed_db()
+
+    @app.cli.command('db-init')
+    def db_init_command():
+        migrations.upgrade()
+        seed_db()
+
+    # Збірка статики: flask --app main assets-build (імена з хешем, .gz/.br, static/dist/manifest.json)
+    assets = AssetPipeline(app)
+    app.extensions['assets'] = assets
+
+    @app.cli.command('assets-build')
+    def assets_build_command():
+        build_assets(app.static_folder)
+        assets.reload()
+
+    # Статична копія публічних сторінок для nginx; без --full перерендерюються лише змінені сторінки
+    @app.cli.command('export-static')
+    @click.option('--out', default='build/site', show_default=True)
+    @click.option('--jobs', default=os.cpu_count() or 2, show_default=True)
+    @click.option('--full', is_flag=True, help='Перерендерити всі сторінки')
+    def export_static_command(out, jobs, full):
+        export_static(app, out, jobs=jobs, full=full)
+
+    @app.cli.command('content-backfill')
+    @click.option('--batch-size', default=200, show_default=True)
+    @click.option('--all', 'rerender', is_flag=True, help='Перерахувати всі записи, а не лише порожні')
+    def content_backfill_command(batch_size, rerender):
+        count = migrations.backfill_content(batch_size, rerender=rerender)
+        print(f"Оновлено записів: {count}")
+
+    # Масовий імпорт новин з JSON або CSV (title, content, image, publish_at)
+    @app.cli.command('news-import')
+    @click.argument('path')
+    @click.option('--batch-size', default=500, show_default=True)
+    def news_import_command(path, batch_size):
+        try:
+            published, scheduled = import_news(load_news_file(path), batch_size)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        print(f"Опубліковано: {published}, заплановано: {scheduled}")
+
+    # Перенесення всього меню між сайтами: flask --app main menu-export menu.json / menu-import menu.json
+    @app.cli.command('menu-export')
+    @click.argument('path')
+    def menu_export_command(path):
+        tree = export_menu()
+        try:
+            dump_menu_file(tree, path)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        print(f"Меню збережено у {path}")
+
+    @app.cli.command('menu-import')
+    @click.argument('path')
+    @click.option('--append', is_flag=True, help='Додати пункти до наявного меню замість заміни')
+    def menu_import_command(path, append):
+        try:
+            count = import_menu(load_menu_file(path), replace=not append)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        print(f"Імпортовано пунктів меню: {count}")
+
+    # Кеші процесу скидаються і після комітів інших воркерів: лічильники в cache_versions
+    version_watcher = VersionWatcher(app, app.config['CACHE_VERSION_INTERVAL'])
+    app.extensions['version_watcher'] = version_watcher
+
+    @app.before_request
+    def check_cache_versions():
+        version_watcher.check(db.session)
+
+    # Дерево меню та індекс сторінок за slug кешуються на рівні процесу
+    menu_cache = MenuCache(app)
+    app.extensions['menu_cache'] = menu_cache
 
     def build_menu_structure():
-        menu_items = []
-        main_items = MenuItem.query.filter_by(parent_id=None).all()
-
-        for main_item in main_items:
-            submenu = MenuItem.query.filter_by(parent_id=main_item.id).all()
-            menu_items.append({
-                'title': main_item.title,
-                'url': main_item.url,
-                'slug': main_item.slug,
-                'submenu': [{'title': sub.title, 'url': sub.url} for sub in submenu] if submenu else None
-            })
-
-        return menu_items
+        return menu_cache.tree()
+
+    storage = make_storage(app)
+    app.extensions['storage'] = storage
+
+    def save_upload(file):
+        # Зберігає файл у сховище за хешем вмісту; повертає ім'я або None для недозволеного типу
+        if not file or file.filename == '' or not allowed_file(file.filename):
+            return None
+        name, created = storage.save(file.stream, file.filename.rsplit('.', 1)[1])
+        if created:
+            image_processor.submit(name)
+        return name
+
+    # Зменшені копії та WebP генеруються у фоні після завантаження
+    image_processor = ImageProcessor(app.config['UPLOAD_FOLDER'],
+                                     max_workers=app.config['IMAGE_WORKERS'],
+                                     max_pending=app.config['IMAGE_MAX_PENDING'])
+    app.extensions['image_processor'] = image_processor
+    app.add_template_global(image_processor.image_url, 'image_url')
+    app.add_template_global(image_processor.image_srcset, 'image_srcset')
+
+    # Готові відповіді публічних сторінок скидаються після змін у news та menu_items
+    page_cache = make_page_cache(app)
+    app.extensions['page_cache'] = page_cache
+
+    latest_news_cache = LatestNewsCache(app, limit=5)
+    app.extensions['latest_news_cache'] = latest_news_cache
+
+    news_scheduler = NewsScheduler(app, interval=app.config['NEWS_SCHEDULER_INTERVAL'])
+    app.extensions['news_scheduler'] = news_scheduler
+
+    @app.before_request
+    def start_news_scheduler():
+        # Планувальник стартує з першим запитом воркера, а не під час імпорту чи CLI-команд
+        if app.config['NEWS_SCHEDULER_ENABLED']:
+            news_scheduler.start()
 
     # Автоматичне додавання меню та новин у всі шаблони
     @app.context_processor
     def inject_globals():
         return {
             'menu_items': build_menu_structure(),
-            'latest_news': News.query.order_by(News.created_at.desc()).limit(5).all()
+            'latest_news': latest_news_cache.get()
         }
 
     # Тепер можна писати маршрути без menu_items та latest_news вручну
 
     @app.route('/')
+    @page_cache.cached
     def index():
         return render_template('index.html', menu_items=build_menu_structure(),
-                               latest_news=News.query.order_by(News.created_at.desc()).limit(5).all())
+                               latest_news=latest_news_cache.get())
 
 
     @app.route('/admin')
@@ -115,14 +326,33 @@ def create_app():
 
 
 
+    @app.route('/admin/perf')
+    @login_required
+    def admin_perf():
+        if not current_user.is_admin:
+            abort(403)
+        report = perf_monitor.report() if perf_monitor else {'routes': [], 'n_plus_one': []}
+        report['auth'] = login_metrics.report()
+        if request.args.get('format') != 'json':
+            # Шаблон сторінки необов'язковий: без нього звіт віддається як JSON
+            try:
+                template = app.jinja_env.get_template('admin_perf.html')
+            except TemplateNotFound:
+                template = None
+            if template is not None:
+                return render_template(template, report=report)
+        return jsonify(report)
+
     @app.route('/admin/menu')
     @login_required
     def menu_list():
         if not current_user.is_admin:
             flash("Доступ заборонено.")
             return redirect(url_for('index'))
-        menu_items = MenuItem.query.filter_by(parent_id=None).all()
-        return render_template('admin_menu_list.html', menu_items=menu_items)
+        menu_items = MenuItem.query.filter_by(parent_id=None).order_by(MenuItem.position, MenuItem.id).all()
+        # Усе дерево в порядку обходу: відступ у шаблоні береться з depth
+        all_items = MenuItem.query.order_by(MenuItem.path).all()
+        return render_template('admin_menu_list.html', menu_items=menu_items, all_items=all_items)
 
     @app.route('/admin/menu/delete/<int:item_id>')
     @login_required
@@ -131,14 +361,47 @@ def create_app():
             flash("Доступ заборонено.")
             return redirect(url_for('index'))
         item = MenuItem.query.get_or_404(item_id)
-        if not item.parent_id:
-            for child in item.submenu:
-                db.session.delete(child)
-        db.session.delete(item)
+        delete_subtree(item)
         db.session.commit()
         flash("Пункт меню успішно видалено.")
         return redirect(url_for('menu_list'))
 
+    @app.route('/admin/menu/move/<int:item_id>', methods=['POST'])
+    @login_required
+    def move_menu(item_id):
+        if not current_user.is_admin:
+            flash("Доступ заборонено.")
+            return redirect(url_for('index'))
+        item = MenuItem.query.get_or_404(item_id)
+        position = request.form.get('position', type=int)
+        try:
+            move_menu_item(item, request.form.get('parent_id'), position)
+            db.session.commit()
+        except ValueError as e:
+            db.session.rollback()
+            flash(str(e))
+            return redirect(url_for('menu_list'))
+        flash("Пункт меню переміщено.")
+        return redirect(url_for('menu_list'))
+
+    @app.route('/admin/menu/reorder', methods=['POST'])
+    @login_required
+    def reorder_menu_items():
+        if not current_user.is_admin:
+            flash("Доступ заборонено.")
+            return redirect(url_for('index'))
+        # order — id сусідів через кому в новому порядку
+        ordered_ids = [value for value in request.form.get('order', '').split(',') if value.strip().isdigit()]
+        try:
+            reorder_menu(request.form.get('parent_id'), ordered_ids)
+            db.session.commit()
+        except ValueError as e:
+            db.session.rollback()
+            flash(str(e))
+            return redirect(url_for('menu_list'))
+        flash("Порядок пунктів меню збережено.")
+        return redirect(url_for('menu_list'))
+
     @app.route('/admin/menu/create', methods=['GET', 'POST'])
     @login_required
     def create_menu():
@@ -151,7 +414,7 @@ def create_app():
             slug = request.form['slug']
             url = request.form.get('url')
             content = request.form.get('content')
-            parent_id = request.form.get('parent_id') or None
+            parent_id = request.form.get('parent_id', type=int)
 
             new_item = MenuItem(
                 title=title,
@@ -161,11 +424,16 @@ def create_app():
                 parent_id=parent_id
             )
             db.session.add(new_item)
-            db.session.commit()
+            try:
+                db.session.commit()
+            except ValueError as e:
+                db.session.rollback()
+                flash(str(e))
+                return redirect(url_for('create_menu'))
             flash("Пункт меню створено.")
             return redirect(url_for('admin_dashboard'))
 
-        parents = MenuItem.query.filter_by(parent_id=None).all()
+        parents = MenuItem.query.order_by(MenuItem.path).all()
         return render_template('admin_create_menu.html', parents=parents)
 
     @app.route('/admin/edit/<int:item_id>', methods=['GET', 'POST'])
@@ -183,42 +451,112 @@ def create_app():
         return render_template('admin_edit_menu.html', item=item)
 
     @app.route('/page/<slug>')
+    @page_cache.cached
     def view_menu_page(slug):
-        item = MenuItem.query.filter_by(slug=slug).first_or_404()
-        menu_items = MenuItem.query.all()
-
-        active_parent_slug = None
-        for parent in menu_items:
-            if parent.submenu:
-                for sub in parent.submenu:
-                    if sub.slug == slug:
-                        active_parent_slug = parent.slug
-                        break
+        page = menu_cache.page(slug)
+        if page is None:
+            abort(404)
 
         return render_template('menu_page.html',
-                               item=item,
+                               item=page.item,
                                active_slug=slug,
-                               active_parent_slug=active_parent_slug)
+                               active_parent_slug=page.parent_slug,
+                               breadcrumbs=page.breadcrumbs,
+                               siblings=page.siblings)
 
 
 
     @app.route('/news')
+    @page_cache.cached
     def all_news():
-        news_list = News.query.order_by(News.created_at.desc()).all()
-        return render_template('news_list.html', news_list=news_list)
+        news_list, next_cursor = news_page(request.args.get('before'), app.config['NEWS_PER_PAGE'])
+        return render_template('news_list.html', news_list=news_list, next_cursor=next_cursor)
+
+    @app.route('/news/feed.json')
+    def news_feed():
+        if not app.config['NEWS_FEED_ENABLED']:
+            abort(404)
+
+        # JSON Feed віддається потоком, сторінка за сторінкою
+        def generate():
+            yield json.dumps({
+                'version': 'https://jsonfeed.org/version/1.1',
+                'title': 'Новини',
+                'home_page_url': url_for('index', _external=True),
+            }, ensure_ascii=False)[:-1] + ', "items": ['
+            for number, article in enumerate(iter_news()):
+                item = {
+                    'id': str(article.id),
+                    'url': url_for('view_news', news_id=article.id, _external=True),
+                    'title': article.title,
+                    'summary': article.excerpt or '',
+                    'date_published': article.created_at.isoformat() + 'Z',
+                }
+                if article.image:
+                    item['image'] = url_for('static', filename=f'uploads/{article.image}', _external=True)
+                yield (', ' if number else '') + json.dumps(item, ensure_ascii=False)
+            yield ']}'
+
+        return Response(stream_with_context(generate()), mimetype='application/feed+json')
 
     @app.route('/news/<int:news_id>')
+    @page_cache.cached
     def view_news(news_id):
-        article = News.query.get_or_404(news_id)
+        article = News.query.filter_by(id=news_id, status=NEWS_PUBLISHED).first_or_404()
         return render_template('view_news.html', article=article)
 
+    @app.route('/search')
+    def search_page():
+        query = request.args.get('q', '').strip()
+        page = max(request.args.get('page', 1, type=int), 1)
+        results, total = search(query, page)
+        for result in results:
+            if result['kind'] == 'news':
+                result['url'] = url_for('view_news', news_id=int(result['ref']))
+            else:
+                result['url'] = url_for('view_menu_page', slug=result['ref'])
+        pages = (total + SEARCH_PER_PAGE - 1) // SEARCH_PER_PAGE
+        return render_template('search.html', query=query, results=results,
+                               page=page, pages=pages, total=total)
+
     @app.route('/admin/news')
     @login_required
     def admin_news_list():
         if not current_user.is_admin:
             abort(403)
-        articles = News.query.order_by(News.created_at.desc()).all()
-        return render_template('admin_news_list.html', articles=articles)
+        articles, next_cursor = news_page(request.args.get('before'), app.config['NEWS_PER_PAGE'], status=None)
+        return render_template('admin_news_list.html', articles=articles, next_cursor=next_cursor)
+
+    @app.route('/admin/news/import', methods=['GET', 'POST'])
+    @login_required
+    def admin_import_news():
+        if not current_user.is_admin:
+            abort(403)
+        if request.method == 'POST':
+            # JSON-список у тілі запиту (API) або файл .json/.csv з форми
+            try:
+                if request.is_json:
+                    records = request.get_json()
+                    if not isinstance(records, list):
+                        raise ValueError('JSON має містити список новин')
+                else:
+                    file = request.files.get('file')
+                    if not file or file.filename == '':
+                        raise ValueError('Файл не вибрано')
+                    records = load_news_stream(file.stream, os.path.splitext(file.filename)[1])
+                published, scheduled = import_news(records, app.config['NEWS_IMPORT_BATCH_SIZE'],
+                                                   echo=app.logger.info)
+            except ValueError as e:
+                db.session.rollback()
+                if request.is_json:
+                    return jsonify({"error": str(e)}), 400
+                flash(str(e))
+                return redirect(url_for('admin_import_news'))
+            if request.is_json:
+                return jsonify({"published": published, "scheduled": scheduled})
+            flash(f"Опубліковано новин: {published}, заплановано: {scheduled}")
+            return redirect(url_for('admin_news_list'))
+        return render_template('admin_import_news.html')
 
 
 
@@ -230,8 +568,13 @@ def create_app():
         if request.method == 'POST':
             title = request.form['title']
             content = request.form['content']
-            image = request.form['image']
-            news = News(title=title, content=content, image=image)
+            image = save_upload(request.files.get('image_file')) or request.form['image']
+            try:
+                publish_at = parse_publish_at(request.form.get('publish_at'))
+            except ValueError as e:
+                flash(str(e))
+                return render_template('admin_create_news.html')
+            news = News(title=title, content=content, image=image, **publication_fields(publish_at))
             db.session.add(news)
             db.session.commit()
             return redirect(url_for('admin_news_list'))
@@ -246,7 +589,16 @@ def create_app():
         if request.method == 'POST':
             article.title = request.form['title']
             article.content = request.form['content']
-            article.image = request.form['image']
+            article.image = save_upload(request.files.get('image_file')) or request.form['image']
+            try:
+                publish_at = parse_publish_at(request.form.get('publish_at'))
+            except ValueError as e:
+                flash(str(e))
+                return render_template('admin_edit_news.html', article=article)
+            if publish_at:
+                # Нова дата публікації: майбутня — новина знову чекає на планувальник
+                for name, value in publication_fields(publish_at).items():
+                    setattr(article, name, value)
             db.session.commit()
             return redirect(url_for('admin_news_list'))
         return render_template('admin_edit_news.html', article=article)
@@ -261,10 +613,32 @@ def create_app():
         db.session.commit()
         return redirect(url_for('admin_news_list'))
 
+    @app.route('/upload-image', methods=['POST'])
+    @login_required
+    def upload_image():
+        if not current_user.is_admin:
+            abort(403)
+        if 'upload' not in request.files:
+            return jsonify({"error": "No file part"}), 400
+
+        file = request.files['upload']
+        if file.filename == '':
+            return jsonify({"error": "No selected file"}), 400
+
+        name = save_upload(file)
+        if name:
+            return jsonify({"url": storage.url(name)})
+
+        return jsonify({"error": "Invalid file type"}), 400
+
     app.register_blueprint(auth_bp)
     return app
 
 app = create_app()
 
 if __name__ == '__main__':
+    # Для локального запуску готуємо базу автоматично
+    with app.app_context():
+        migrations.upgrade()
+        seed_db()
     app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
@@ -0,0 +1,237 @@
+import threading
+from collections import defaultdict, namedtuple
+
+from sqlalchemy import and_, bindparam, delete, event, func, inspect, literal, select, update
+from sqlalchemy.orm.attributes import set_committed_value
+from unidecode import unidecode
+
+from changes import on_commit
+from db import db, MenuItem
+from search import remove_documents
+
+# Незмінний знімок рядка menu_items, який можна безпечно ділити між запитами
+MenuNode = namedtuple('MenuNode', 'id title url slug parent_id depth content content_html excerpt')
+
+# Усе, що потрібно сторінці /page/<slug>, без додаткових запитів до БД
+MenuPage = namedtuple('MenuPage', 'item parent_slug breadcrumbs siblings')
+
+PATH_SEGMENT_WIDTH = 6
+
+# Кожен рівень займає в MenuItem.path PATH_SEGMENT_WIDTH + 1 символів, тож у String(255)
+# вміщається не більше 36 рівнів вкладеності (глибина 0–35)
+MAX_MENU_DEPTH = MenuItem.__table__.c.path.type.length // (PATH_SEGMENT_WIDTH + 1)
+
+
+def generate_slug(title):
+    return unidecode(title.lower().replace(' ', '_'))
+
+
+def path_segment(item_id):
+    return f'{item_id:0{PATH_SEGMENT_WIDTH}d}/'
+
+
+def check_depth(depth):
+    if depth >= MAX_MENU_DEPTH:
+        raise ValueError(f'Меню не може мати більше {MAX_MENU_DEPTH} рівнів вкладеності')
+
+
+def _subtree(column, path):
+    # Усі шляхи з префіксом path: діапазон [path, path без '/' + '0'), який покриває індекс
+    return and_(column >= path, column < path[:-1] + '0')
+
+
+def subtree_filter(path):
+    return _subtree(MenuItem.path, path)
+
+
+def _subtree_height(connection, path, depth):
+    # На скільки рівнів піддерево спускається нижче свого кореня
+    deepest = connection.execute(select(func.max(MenuItem.depth)).where(subtree_filter(path))).scalar()
+    return (deepest if deepest is not None else depth) - depth
+
+
+def _parse_parent_id(value):
+    # parent_id приходить з форми рядком; порожнє значення — корінь меню
+    if not value:
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'Некоректний батьківський пункт меню: {value!r}')
+
+
+def _siblings(column, parent_id):
+    return column.is_(None) if parent_id is None else column == parent_id
+
+
+def _parent_path(connection, parent_id):
+    if parent_id is None:
+        return '', -1
+    row = connection.execute(select(MenuItem.path, MenuItem.depth).where(MenuItem.id == parent_id)).first()
+    if row is None or row.path is None:
+        return '', -1
+    return row.path, row.depth
+
+
+def _next_position(connection, parent_id):
+    last = connection.execute(select(func.max(MenuItem.position))
+                              .where(_siblings(MenuItem.parent_id, parent_id))).scalar()
+    return 0 if last is None else last + 1
+
+
+@event.listens_for(MenuItem, 'before_insert')
+def _append_position(mapper, connection, target):
+    if target.position is None:
+        target.position = _next_position(connection, target.parent_id)
+
+
+@event.listens_for(MenuItem, 'after_insert')
+def _assign_path(mapper, connection, target):
+    # id відомий лише після вставки, тож шлях дописується окремим UPDATE у тій самій транзакції
+    parent_path, parent_depth = _parent_path(connection, target.parent_id)
+    check_depth(parent_depth + 1)
+    path = parent_path + path_segment(target.id)
+    table = MenuItem.__table__
+    connection.execute(update(table).where(table.c.id == target.id).values(path=path, depth=parent_depth + 1))
+    set_committed_value(target, 'path', path)
+    set_committed_value(target, 'depth', parent_depth + 1)
+
+
+@event.listens_for(MenuItem, 'after_update')
+def _rebase_subtree(mapper, connection, target):
+    # Зміна parent_id переносить усе піддерево одним UPDATE
+    if not target.path or not inspect(target).attrs.parent_id.history.has_changes():
+        return
+    old_path = target.path
+    parent_path, parent_depth = _parent_path(connection, target.parent_id)
+    if parent_path.startswith(old_path):
+        raise ValueError('Пункт меню не можна перемістити у власне піддерево')
+    new_path = parent_path + path_segment(target.id)
+    depth_delta = parent_depth + 1 - target.depth
+
+    table = MenuItem.__table__
+    check_depth(parent_depth + 1 + _subtree_height(connection, old_path, target.depth))
+    connection.execute(
+        update(table)
+        .where(_subtree(table.c.path, old_path))
+        .values(path=literal(new_path) + func.substr(table.c.path, len(old_path) + 1),
+                depth=table.c.depth + depth_delta)
+    )
+    set_committed_value(target, 'path', new_path)
+    set_committed_value(target, 'depth', target.depth + depth_delta)
+
+
+def delete_subtree(item):
+    # Пункт разом з нащадками будь-якої глибини одним DELETE за індексом path
+    condition = subtree_filter(item.path)
+    ids = list(db.session.execute(select(MenuItem.id).where(condition)).scalars())
+    db.session.execute(delete(MenuItem).where(condition), execution_options={'synchronize_session': 'fetch'})
+    remove_documents(db.session.connection(), 'page', ids)
+    return len(ids)
+
+
+def move_menu_item(item, parent_id, position=None):
+    parent_id = _parse_parent_id(parent_id)
+    parent_depth = -1
+    if parent_id is not None:
+        parent = db.session.get(MenuItem, parent_id)
+        if parent is None or parent.path.startswith(item.path):
+            raise ValueError('Пункт меню не можна перемістити у власне піддерево')
+        parent_depth = parent.depth
+    # Перевіряємо до змін, щоб не зсувати сусідів даремно; події flush перевірять ще раз
+    check_depth(parent_depth + 1 + _subtree_height(db.session.connection(), item.path, item.depth))
+
+    if position is None:
+        position = _next_position(db.session.connection(), parent_id)
+    else:
+        # Звільняємо місце серед нових сусідів одним UPDATE
+        db.session.execute(
+            update(MenuItem)
+            .where(_siblings(MenuItem.parent_id, parent_id), MenuItem.position >= position, MenuItem.id != item.id)
+            .values(position=MenuItem.position + 1),
+            execution_options={'synchronize_session': False}
+        )
+    item.parent_id = parent_id
+    item.position = position
+
+
+def reorder_menu(parent_id, ordered_ids):
+    # Новий порядок сусідів одним executemany; чужі id не зачіпаються
+    table = MenuItem.__table__
+    parent_id = _parse_parent_id(parent_id)
+    rows = [{'item_id': int(item_id), 'new_position': position} for position, item_id in enumerate(ordered_ids)]
+    if rows:
+        db.session.execute(
+            update(table)
+            .where(table.c.id == bindparam('item_id'), _siblings(table.c.parent_id, parent_id))
+            .values(position=bindparam('new_position')),
+            rows
+        )
+
+
+class MenuCache:
+    # Дерево меню та індекс slug -> сторінка, спільні для всіх запитів процесу.
+    # Завантажуються одним запитом і скидаються після коміту змін у menu_items.
+
+    def __init__(self, app):
+        self._lock = threading.Lock()
+        self._snapshot = None
+        on_commit(app, MenuItem.__tablename__, self.invalidate)
+
+    def invalidate(self):
+        with self._lock:
+            self._snapshot = None
+
+    def tree(self):
+        return self._get()[0]
+
+    def page(self, slug):
+        return self._get()[1].get(slug)
+
+    def _get(self):
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._lock:
+                if self._snapshot is None:
+                    self._snapshot = self._build()
+                snapshot = self._snapshot
+        return snapshot
+
+    def _build(self):
+        rows = db.session.query(
+            MenuItem.id, MenuItem.title, MenuItem.url, MenuItem.slug, MenuItem.parent_id, MenuItem.depth,
+            MenuItem.content, MenuItem.content_html, MenuItem.excerpt
+        ).order_by(MenuItem.depth, MenuItem.position, MenuItem.id).all()
+
+        nodes = [MenuNode(*row) for row in rows]
+        by_id = {node.id: node for node in nodes}
+        children = defaultdict(list)
+        for node in nodes:
+            children[node.parent_id].append(node)
+
+        def entry(node):
+            return {
+                'title': node.title,
+                'url': node.url,
+                'slug': node.slug,
+                'submenu': [entry(child) for child in children.get(node.id, ())] or None
+            }
+
+        tree = [entry(node) for node in children[None]]
+
+        pages = {}
+        for node in nodes:
+            parent = by_id.get(node.parent_id)
+            breadcrumbs = [node]
+            while parent is not None and len(breadcrumbs) <= len(nodes):
+                breadcrumbs.append(parent)
+                parent = by_id.get(parent.parent_id)
+            breadcrumbs.reverse()
+            pages[node.slug] = MenuPage(
+                item=node,
+                parent_slug=by_id[node.parent_id].slug if node.parent_id in by_id else None,
+                breadcrumbs=breadcrumbs,
+                siblings=children[node.parent_id]
+            )
+
+        return tree, pages
@@ -0,0 +1,141 @@
+import json
+import os
+from collections import Counter, deque
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from content import render_content
+from db import db, MenuItem, sync_id_sequence
+from menu import check_depth, generate_slug, path_segment
+from search import rebuild_search_index
+
+try:
+    import yaml
+except ImportError:  # YAML необов'язковий, JSON працює завжди
+    yaml = None
+
+# Формат файлу: список пунктів {title, slug, url, content, submenu: [...]}
+FIELDS = ('title', 'slug', 'url', 'content')
+
+
+def _is_yaml(path):
+    return os.path.splitext(path)[1].lower() in ('.yaml', '.yml')
+
+
+def load_menu_file(path):
+    with open(path, encoding='utf-8') as f:
+        if _is_yaml(path):
+            if yaml is None:
+                raise ValueError('Для YAML потрібен пакет PyYAML')
+            return yaml.safe_load(f) or []
+        return json.load(f)
+
+
+def dump_menu_file(tree, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        if _is_yaml(path):
+            if yaml is None:
+                raise ValueError('Для YAML потрібен пакет PyYAML')
+            yaml.safe_dump(tree, f, allow_unicode=True, sort_keys=False)
+        else:
+            json.dump(tree, f, ensure_ascii=False, indent=2)
+
+
+def export_menu():
+    # Усе дерево одним запитом, у порядку пунктів серед сусідів
+    rows = db.session.execute(
+        select(MenuItem.id, MenuItem.parent_id, *[getattr(MenuItem, field) for field in FIELDS])
+        .order_by(MenuItem.depth, MenuItem.position, MenuItem.id)
+    ).all()
+
+    nodes = {}
+    roots = []
+    for row in rows:
+        nodes[row.id] = {field: getattr(row, field) for field in FIELDS if getattr(row, field) is not None}
+        nodes[row.id]['submenu'] = []
+    for row in rows:
+        parent = nodes.get(row.parent_id)
+        (parent['submenu'] if parent else roots).append(nodes[row.id])
+    for node in nodes.values():
+        if not node['submenu']:
+            del node['submenu']
+    return roots
+
+
+def flatten_menu(tree, first_id=1, taken_slugs=(), first_position=0):
+    # Перетворює дерево на рядки з наперед обчисленими id, parent_id, path та depth і перевіряє slug
+    if not isinstance(tree, list):
+        raise ValueError('Меню має бути списком пунктів')
+    rows = []
+    root = {'id': None, 'path': '', 'depth': -1}
+    # number — місце пункту в дереві для повідомлень про помилки, напр. «2.1» — перший підпункт другого
+    pending = deque((root, first_position + position, item, str(position + 1))
+                    for position, item in enumerate(tree))
+    while pending:
+        parent, position, item, number = pending.popleft()
+        if not isinstance(item, dict):
+            raise ValueError(f'Пункт меню {number}: очікується об\'єкт з полями {", ".join(FIELDS)}')
+        # З YAML легко отримати число (title: 2025) чи список — усі поля мають бути рядками
+        wrong = [name for name in FIELDS if item.get(name) is not None and not isinstance(item[name], str)]
+        if wrong:
+            raise ValueError(f'Пункт меню {number}: поля {", ".join(wrong)} мають бути рядками')
+        if not (item.get('title') or '').strip():
+            raise ValueError(f'Пункт меню {number}: немає назви')
+        submenu = item.get('submenu') or []
+        if not isinstance(submenu, list):
+            raise ValueError(f'Пункт меню {number}: submenu має бути списком')
+        check_depth(parent['depth'] + 1)
+        row = {
+            'id': first_id + len(rows),
+            'title': item['title'],
+            'slug': item.get('slug') or generate_slug(item['title']),
+            'url': item.get('url') or '#',
+            'content': item.get('content'),
+            'parent_id': parent['id'],
+            'path': parent['path'] + path_segment(first_id + len(rows)),
+            'depth': parent['depth'] + 1,
+            'position': position,
+            # Масова вставка минає події ORM, тому похідні поля рахуємо тут
+            **render_content(item.get('content')),
+        }
+        rows.append(row)
+        pending.extend((row, child_position, child, f'{number}.{child_position + 1}')
+                       for child_position, child in enumerate(submenu))
+
+    counts = Counter(row['slug'] for row in rows)
+    duplicates = sorted(slug for slug, count in counts.items() if count > 1)
+    duplicates += sorted(set(counts) & set(taken_slugs))
+    if duplicates:
+        raise ValueError('Повторювані slug: ' + ', '.join(duplicates))
+    return rows
+
+
+def import_menu(tree, replace=True):
+    # replace=True замінює все меню; інакше пункти додаються до наявних
+    if replace:
+        first_id, taken_slugs, first_position = 1, (), 0
+    else:
+        first_id = (db.session.execute(select(func.max(MenuItem.id))).scalar() or 0) + 1
+        taken_slugs = set(db.session.execute(select(MenuItem.slug)).scalars())
+        last_position = db.session.execute(
+            select(func.max(MenuItem.position)).where(MenuItem.parent_id.is_(None))).scalar()
+        first_position = 0 if last_position is None else last_position + 1
+
+    rows = flatten_menu(tree, first_id, taken_slugs, first_position)
+    try:
+        if replace:
+            db.session.execute(delete(MenuItem))
+        if rows:
+            db.session.execute(insert(MenuItem), rows)
+
+        connection = db.session.connection()
+        sync_id_sequence(connection, MenuItem.__tablename__)
+        rebuild_search_index(connection, kinds=('page',))
+        db.session.commit()
+    except (IntegrityError, OperationalError) as e:
+        # id та slug для додавання обчислено заздалегідь: паралельна зміна меню в адмінці
+        # могла зайняти їх або тримати запис, поки йшов імпорт
+        db.session.rollback()
+        raise ValueError(f'Меню не імпортовано: {e.orig}. Жоден пункт не збережено, спробуйте ще раз')
+    return len(rows)
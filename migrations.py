@@ -0,0 +1,184 @@
+from sqlalchemy import bindparam, inspect, select, text, update
+
+from changes import SHARED_TABLES
+from content import make_excerpt, render_content
+from db import db, CacheVersion, News, MenuItem, NEWS_PUBLISHED
+from menu import path_segment
+from search import create_search_index, rebuild_search_index
+
+# Кожна міграція ідемпотентна: бази, створені до появи schema_version, теж оновлюються коректно
+
+BACKFILL_BATCH_SIZE = 200
+
+
+def _initial(connection):
+    db.metadata.create_all(connection)
+
+
+def _news_excerpt(connection):
+    columns = {column['name'] for column in inspect(connection).get_columns('news')}
+    if 'excerpt' not in columns:
+        connection.execute(text('ALTER TABLE news ADD COLUMN excerpt VARCHAR(500)'))
+        rows = connection.execute(text('SELECT id, content FROM news')).all()
+        if rows:
+            connection.execute(text('UPDATE news SET excerpt = :excerpt WHERE id = :id'),
+                               [{'id': row.id, 'excerpt': make_excerpt(row.content)} for row in rows])
+    for index in News.__table__.indexes:
+        if index.name == 'ix_news_created_at_id':
+            index.create(connection, checkfirst=True)
+
+
+def _search_index(connection):
+    # Лише порожня таблиця: вибірка для індексу залежить від колонок пізніших міграцій,
+    # тож заповнює його міграція 6
+    create_search_index(connection)
+
+
+def _derived_content(connection):
+    for table in ('news', 'menu_items'):
+        columns = {column['name'] for column in inspect(connection).get_columns(table)}
+        for name, ddl in (('content_html', 'TEXT'), ('excerpt', 'VARCHAR(500)'),
+                          ('word_count', 'INTEGER'), ('images', 'TEXT')):
+            if name not in columns:
+                connection.execute(text(f'ALTER TABLE {table} ADD COLUMN {name} {ddl}'))
+    # Сторінки читають content_html без запасного варіанта, тож наявні рядки заповнюємо одразу
+    for model in (News, MenuItem):
+        last_id = 0
+        while True:
+            rows = _render_batch(connection, model, last_id, BACKFILL_BATCH_SIZE)
+            if not rows:
+                break
+            last_id = rows[-1].id
+
+
+def _menu_path(connection):
+    columns = {column['name'] for column in inspect(connection).get_columns('menu_items')}
+    for name, ddl in (('path', 'VARCHAR(255)'), ('depth', 'INTEGER NOT NULL DEFAULT 0'),
+                      ('position', 'INTEGER NOT NULL DEFAULT 0')):
+        if name not in columns:
+            connection.execute(text(f'ALTER TABLE menu_items ADD COLUMN {name} {ddl}'))
+
+    # Шляхи рахуються в пам'яті від коренів; пункти з циклом у parent_id стають коренями
+    rows = connection.execute(text('SELECT id, parent_id FROM menu_items ORDER BY id')).all()
+    parents = {row.id: row.parent_id for row in rows}
+    paths = {}
+
+    def resolve(item_id, seen=()):
+        if item_id not in paths:
+            parent_id = parents.get(item_id)
+            if parent_id not in parents or parent_id in seen:
+                parent_path, parent_depth = '', -1
+            else:
+                parent_path, parent_depth = resolve(parent_id, seen + (item_id,))
+            paths[item_id] = (parent_path + path_segment(item_id), parent_depth + 1)
+        return paths[item_id]
+
+    positions = {}
+    updates = []
+    for row in rows:
+        path, depth = resolve(row.id)
+        position = positions.get(row.parent_id, 0)
+        positions[row.parent_id] = position + 1
+        updates.append({'row_id': row.id, 'new_path': path, 'new_depth': depth, 'new_position': position})
+    if updates:
+        table = MenuItem.__table__
+        connection.execute(
+            update(table).where(table.c.id == bindparam('row_id'))
+            .values(path=bindparam('new_path'), depth=bindparam('new_depth'),
+                    position=bindparam('new_position')),
+            updates
+        )
+    for index in MenuItem.__table__.indexes:
+        index.create(connection, checkfirst=True)
+
+
+def _news_publishing(connection):
+    # Наявні новини вже опубліковані
+    columns = {column['name'] for column in inspect(connection).get_columns('news')}
+    if 'status' not in columns:
+        connection.execute(text("ALTER TABLE news ADD COLUMN status VARCHAR(16) NOT NULL "
+                                f"DEFAULT '{NEWS_PUBLISHED}'"))
+    if 'publish_at' not in columns:
+        connection.execute(text('ALTER TABLE news ADD COLUMN publish_at DATETIME'))
+    for index in News.__table__.indexes:
+        index.create(connection, checkfirst=True)
+    # Індекс пошуку будується тут, коли схема вже остаточна; заплановані новини в нього не потрапляють
+    rebuild_search_index(connection)
+
+
+def _cache_versions(connection):
+    CacheVersion.__table__.create(connection, checkfirst=True)
+    existing = set(connection.execute(select(CacheVersion.name)).scalars())
+    rows = [{'name': name, 'version': 0} for name in SHARED_TABLES if name not in existing]
+    if rows:
+        connection.execute(CacheVersion.__table__.insert(), rows)
+
+
+# (версія, опис, функція)
+MIGRATIONS = [
+    (1, 'Початкова схема', _initial),
+    (2, 'Короткий текст новин та індекс для пагінації', _news_excerpt),
+    (3, 'Повнотекстовий пошук FTS5', _search_index),
+    (4, 'Похідні поля вмісту: очищений HTML, уривок, кількість слів, зображення', _derived_content),
+    (5, 'Матеріалізований шлях, глибина та порядок пунктів меню', _menu_path),
+    (6, 'Стан і час публікації новин', _news_publishing),
+    (7, 'Спільні лічильники змін для скидання кешів у всіх воркерах', _cache_versions),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(connection):
+    connection.execute(text('CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)'))
+    return connection.execute(text('SELECT MAX(version) FROM schema_version')).scalar() or 0
+
+
+def upgrade(echo=print):
+    # Застосовує всі міграції новіші за записану версію; кожна — в окремій транзакції
+    with db.engine.begin() as connection:
+        version = current_version(connection)
+
+    for number, description, migrate in MIGRATIONS:
+        if number <= version:
+            continue
+        with db.engine.begin() as connection:
+            migrate(connection)
+            connection.execute(text('INSERT INTO schema_version (version) VALUES (:version)'),
+                               {'version': number})
+        echo(f'Міграція {number}: {description}')
+    return LATEST_VERSION
+
+
+def _render_batch(connection, model, last_id, batch_size, rerender=False):
+    # Рахує похідні поля для наступної пачки рядків після last_id; повертає оброблені рядки
+    statement = select(model.id, model.content).where(model.id > last_id)
+    if not rerender:
+        statement = statement.where(model.content_html.is_(None))
+    rows = connection.execute(statement.order_by(model.id).limit(batch_size)).all()
+    if rows:
+        connection.execute(
+            update(model.__table__).where(model.__table__.c.id == bindparam('row_id')),
+            [dict(row_id=row.id, **render_content(row.content)) for row in rows]
+        )
+    return rows
+
+
+def backfill_content(batch_size=BACKFILL_BATCH_SIZE, echo=print, rerender=False):
+    # Заповнює похідні поля, порожні після збою чи запису в обхід ORM; кожна пачка — окрема транзакція.
+    # rerender=True перераховує всі рядки — після змін у правилах очищення HTML.
+    total = 0
+    for model in (News, MenuItem):
+        last_id = 0
+        while True:
+            with db.engine.begin() as connection:
+                rows = _render_batch(connection, model, last_id, batch_size, rerender)
+                if not rows:
+                    break
+                # Запис в обхід сесії: кеші воркерів скидаємо через лічильник напряму
+                connection.execute(update(CacheVersion.__table__)
+                                   .where(CacheVersion.name == model.__tablename__)
+                                   .values(version=CacheVersion.version + 1))
+            last_id = rows[-1].id
+            total += len(rows)
+            echo(f'{model.__tablename__}: оброблено до id {last_id}')
+    return total
@@ -0,0 +1,88 @@
+import threading
+from collections import namedtuple
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import load_only
+
+from changes import on_commit
+from db import db, News, NEWS_PUBLISHED
+
+NEWS_PER_PAGE = 20
+
+# Колонки, потрібні для карток у списках; повний content не завантажується
+LIST_COLUMNS = (News.id, News.title, News.image, News.excerpt, News.created_at)
+
+
+def encode_cursor(article):
+    return f'{article.created_at.isoformat()},{article.id}'
+
+
+def decode_cursor(cursor):
+    # Некоректний курсор означає першу сторінку
+    try:
+        created_at, news_id = cursor.rsplit(',', 1)
+        return datetime.fromisoformat(created_at), int(news_id)
+    except (AttributeError, ValueError):
+        return None
+
+
+def keyset_before(position):
+    created_at, news_id = position
+    return or_(News.created_at < created_at, and_(News.created_at == created_at, News.id < news_id))
+
+
+def news_page(cursor=None, per_page=NEWS_PER_PAGE, status=NEWS_PUBLISHED):
+    # Keyset-пагінація по (created_at, id): сторінка будь-якої глибини — один індексний запит.
+    # status=None — усі новини (для адмінки), інакше лише новини з цим станом.
+    query = News.query.options(load_only(*LIST_COLUMNS))
+    if status is not None:
+        query = query.filter(News.status == status)
+    position = decode_cursor(cursor) if cursor else None
+    if position:
+        query = query.filter(keyset_before(position))
+    items = query.order_by(News.created_at.desc(), News.id.desc()).limit(per_page + 1).all()
+
+    next_cursor = encode_cursor(items[per_page - 1]) if len(items) > per_page else None
+    return items[:per_page], next_cursor
+
+
+def iter_news(per_page=100, status=NEWS_PUBLISHED):
+    # Проходить усі новини сторінками, не тримаючи весь архів у пам'яті
+    cursor = None
+    while True:
+        items, cursor = news_page(cursor, per_page, status)
+        yield from items
+        if cursor is None:
+            break
+
+
+# Знімок новини для блоку «останні новини», який можна ділити між запитами
+NewsSnapshot = namedtuple('NewsSnapshot', 'id title image content excerpt created_at')
+
+
+class LatestNewsCache:
+    # Останні новини для всіх шаблонів; скидаються після коміту змін у news
+
+    def __init__(self, app, limit=5):
+        self.limit = limit
+        self._lock = threading.Lock()
+        self._items = None
+        on_commit(app, News.__tablename__, self.invalidate)
+
+    def invalidate(self):
+        with self._lock:
+            self._items = None
+
+    def get(self):
+        items = self._items
+        if items is None:
+            with self._lock:
+                if self._items is None:
+                    rows = db.session.query(News.id, News.title, News.image, News.content, News.excerpt,
+                                            News.created_at) \
+                        .filter(News.status == NEWS_PUBLISHED) \
+                        .order_by(News.created_at.desc(), News.id.desc()).limit(self.limit).all()
+                    self._items = [NewsSnapshot(*row) for row in rows]
+                items = self._items
+        return items
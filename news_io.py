@@ -0,0 +1,123 @@
+import csv
+import io
+import json
+import os
+from collections import namedtuple
+from datetime import datetime, timezone
+
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+
+from content import render_content
+from db import db, News, NEWS_PUBLISHED, NEWS_SCHEDULED
+from search import index_documents
+
+IMPORT_BATCH_SIZE = 500
+
+# Формат: список записів {title, content, image, publish_at}; CSV — ті самі колонки в заголовку
+FIELDS = ('title', 'content', 'image', 'publish_at')
+
+# Поля, які читає search.index_documents
+SearchRow = namedtuple('SearchRow', 'id title content')
+
+
+def parse_publish_at(value):
+    # ISO 8601; час з часовим поясом переводиться в UTC, без поясу вважається UTC
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        moment = value
+    else:
+        try:
+            moment = datetime.fromisoformat(str(value).strip().replace('Z', '+00:00'))
+        except ValueError:
+            raise ValueError(f'Некоректна дата публікації: {value!r}')
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+
+def publication_fields(publish_at, now=None):
+    # Майбутня дата — новина чекає на планувальник; created_at стає датою публікації
+    now = now or datetime.utcnow()
+    if publish_at and publish_at > now:
+        return {'status': NEWS_SCHEDULED, 'publish_at': publish_at, 'created_at': publish_at}
+    return {'status': NEWS_PUBLISHED, 'publish_at': publish_at, 'created_at': publish_at or now}
+
+
+def load_news_stream(stream, extension):
+    extension = extension.lower().lstrip('.')
+    if extension == 'csv':
+        text_stream = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+        try:
+            return list(csv.DictReader(text_stream))
+        except csv.Error as e:
+            raise ValueError(f'Некоректний CSV: {e}')
+    if extension == 'json':
+        records = json.load(io.TextIOWrapper(stream, encoding='utf-8'))
+        if not isinstance(records, list):
+            raise ValueError('JSON має містити список новин')
+        return records
+    raise ValueError('Підтримуються лише файли .json та .csv')
+
+
+def load_news_file(path):
+    with open(path, 'rb') as f:
+        return load_news_stream(f, os.path.splitext(path)[1])
+
+
+def news_rows(records, now=None):
+    now = now or datetime.utcnow()
+    rows = []
+    for number, record in enumerate(records, 1):
+        if not isinstance(record, dict):
+            raise ValueError(f'Запис {number}: очікується об\'єкт з полями {", ".join(FIELDS)}')
+        unknown = {str(name) for name in record if name not in FIELDS}
+        if unknown:
+            raise ValueError(f'Запис {number}: невідомі поля {", ".join(sorted(unknown))}')
+        # З JSON можуть прийти числа, списки тощо — усі поля мають бути рядками
+        wrong = [name for name in FIELDS if record.get(name) is not None and not isinstance(record[name], str)]
+        if wrong:
+            raise ValueError(f'Запис {number}: поля {", ".join(wrong)} мають бути рядками')
+        if not (record.get('title') or '').strip():
+            raise ValueError(f'Запис {number}: немає назви')
+        try:
+            publish_at = parse_publish_at(record.get('publish_at'))
+        except ValueError as e:
+            raise ValueError(f'Запис {number}: {e}')
+        rows.append({
+            'title': record['title'].strip(),
+            'content': record.get('content') or '',
+            'image': record.get('image') or None,
+            **publication_fields(publish_at, now),
+            # Масова вставка минає події ORM, тому похідні поля рахуємо тут
+            **render_content(record.get('content')),
+        })
+    return rows
+
+
+def import_news(records, batch_size=IMPORT_BATCH_SIZE, echo=print):
+    # Усі записи перевіряються до першої вставки; далі — пачками, кожна в окремій транзакції.
+    # id призначає база, тож імпорт не конфліктує з новинами, які паралельно додає адмінка.
+    rows = news_rows(records)
+
+    published = scheduled = 0
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        try:
+            ids = db.session.execute(insert(News).returning(News.id, sort_by_parameter_order=True),
+                                     batch).scalars().all()
+            # В індекс пошуку одразу йдуть лише опубліковані; заплановані додасть планувальник
+            index_documents(db.session.connection(), 'news',
+                            [SearchRow(news_id, row['title'], row['content'])
+                             for news_id, row in zip(ids, batch) if row['status'] == NEWS_PUBLISHED])
+            db.session.commit()
+        except IntegrityError as e:
+            db.session.rollback()
+            raise ValueError(f'Записи {start + 1}–{start + len(batch)} не імпортовано: {e.orig}. '
+                             f'Попередні {start} записів уже збережено')
+        published += sum(row['status'] == NEWS_PUBLISHED for row in batch)
+        scheduled += sum(row['status'] == NEWS_SCHEDULED for row in batch)
+        echo(f'Імпортовано {start + len(batch)} з {len(rows)}')
+    return published, scheduled
+
@@ -0,0 +1,202 @@
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from datetime import datetime
+from functools import wraps
+from urllib.parse import urlencode
+
+from flask import current_app, make_response, request, session
+from flask_login import current_user
+
+from changes import on_commit
+from db import db, MenuItem, News, NEWS_PUBLISHED
+
+CachedPage = namedtuple('CachedPage', 'body mimetype etag last_modified')
+
+# Параметри запиту, від яких залежить сторінка; решта не потрапляє в ключ кешу
+CACHED_QUERY_PARAMS = {'all_news': ('before',)}
+
+
+class MemoryBackend:
+    # LRU у пам'яті процесу з обмеженим часом життя записів
+
+    def __init__(self, max_entries=256, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._changed_at = time.time()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, page = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return page
+
+    def set(self, key, page):
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl, page)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._changed_at = time.time()
+
+    def changed_at(self):
+        return self._changed_at
+
+
+class FileSystemBackend:
+    # Сторінки у файлах спільного каталогу, щоб кеш бачили всі воркери gunicorn.
+    # Очищення лише оновлює мітку .changed; старші за неї та прострочені файли видаляє prune,
+    # який також тримає каталог у межах max_entries файлів.
+
+    STAMP = '.changed'
+    PRUNE_EVERY = 32  # записів між прибираннями каталогу
+
+    def __init__(self, directory, ttl=300, max_entries=2048):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._writes = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.cache')
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            mtime = os.path.getmtime(path)
+            if mtime + self.ttl < time.time() or mtime < self.changed_at():
+                return None
+            with open(path, 'rb') as f:
+                return pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def set(self, key, page):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(page, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self._path(key))
+        self._writes += 1
+        if self._writes % self.PRUNE_EVERY == 0:
+            self.prune()
+
+    def clear(self):
+        with open(os.path.join(self.directory, self.STAMP), 'w'):
+            pass
+        self.prune()
+
+    def prune(self):
+        changed_at = self.changed_at()
+        expired_before = time.time() - self.ttl
+        fresh = []
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith('.cache'):
+                continue
+            try:
+                mtime = entry.stat().st_mtime
+                if mtime < changed_at or mtime < expired_before:
+                    os.remove(entry.path)
+                else:
+                    fresh.append((mtime, entry.path))
+            except FileNotFoundError:
+                pass
+        fresh.sort()
+        for _, path in fresh[:max(0, len(fresh) - self.max_entries)]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def changed_at(self):
+        try:
+            return os.path.getmtime(os.path.join(self.directory, self.STAMP))
+        except OSError:
+            return 0
+
+
+class PageCache:
+    # Кеш готових відповідей публічних сторінок з ETag/Last-Modified та відповіддю 304
+
+    def __init__(self, app, backend):
+        self.backend = backend
+        self._generation = 0
+        self._lock = threading.Lock()
+        on_commit(app, News.__tablename__, self.clear)
+        on_commit(app, MenuItem.__tablename__, self.clear)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+        self.backend.clear()
+
+    def key(self, endpoint, path, args):
+        # Зміни меню очищують кеш через on_commit, тож версія меню в ключі не потрібна
+        params = [(name, args.get(name)) for name in CACHED_QUERY_PARAMS.get(endpoint, ()) if args.get(name)]
+        return f'{endpoint}|{path}?{urlencode(params)}'
+
+    def _last_modified(self):
+        latest = db.session.query(db.func.max(News.created_at)).filter(News.status == NEWS_PUBLISHED).scalar()
+        changed_at = datetime.utcfromtimestamp(int(self.backend.changed_at()))
+        return max(latest, changed_at) if latest else changed_at
+
+    def cached(self, view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # Сторінки адміністратора та сторінки з flash-повідомленнями не кешуємо
+            if (not current_app.config.get('PAGE_CACHE_ENABLED', True) or request.method != 'GET'
+                    or current_user.is_authenticated or session.get('_flashes')):
+                return view(*args, **kwargs)
+
+            key = self.key(request.endpoint, request.path, request.args)
+            page = self.backend.get(key)
+            if page is None:
+                generation = self._generation
+                changed_at = self.backend.changed_at()
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200 or response.is_streamed or response.direct_passthrough:
+                    return response
+                body = response.get_data()
+                page = CachedPage(body, response.mimetype, hashlib.sha1(body).hexdigest(),
+                                  self._last_modified())
+                with self._lock:
+                    # Якщо кеш скинули, поки сторінка рендерилась, вона могла застаріти — тоді не зберігаємо.
+                    # Лічильник ловить очищення в цьому процесі, мітка бекенда — в інших воркерах
+                    if generation == self._generation and changed_at == self.backend.changed_at():
+                        self.backend.set(key, page)
+
+            response = current_app.response_class(page.body, mimetype=page.mimetype)
+            response.set_etag(page.etag)
+            response.last_modified = page.last_modified
+            response.cache_control.no_cache = True
+            return response.make_conditional(request)
+
+        return wrapper
+
+
+def make_page_cache(app):
+    backend_name = app.config.get('PAGE_CACHE_BACKEND', 'memory')
+    ttl = app.config.get('PAGE_CACHE_TTL', 300)
+    if backend_name == 'filesystem':
+        directory = app.config.get('PAGE_CACHE_DIR') or os.path.join(app.instance_path, 'page_cache')
+        backend = FileSystemBackend(directory, ttl=ttl,
+                                    max_entries=app.config.get('PAGE_CACHE_MAX_FILES', 2048))
+    else:
+        backend = MemoryBackend(max_entries=app.config.get('PAGE_CACHE_MAX_ENTRIES', 256), ttl=ttl)
+    return PageCache(app, backend)
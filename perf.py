@@ -0,0 +1,162 @@
+import threading
+import time
+from collections import Counter, defaultdict, deque
+
+from flask import g, has_request_context, request, before_render_template, template_rendered
+from flask_login import current_user
+from sqlalchemy import event
+
+from db import db
+
+# Межі кошиків гістограми тривалості запиту, мс
+HISTOGRAM_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def _parameters_key(parameters):
+    # Параметри запиту як ключ множини; словники та списки DBAPI-драйверів не хешуються
+    if isinstance(parameters, dict):
+        parameters = tuple(sorted(parameters.items()))
+    elif isinstance(parameters, list):
+        parameters = tuple(parameters)
+    try:
+        hash(parameters)
+    except TypeError:
+        return repr(parameters)
+    return parameters
+
+
+class PerfMonitor:
+    # Лічильники SQL та часу рендерингу для кожного запиту.
+    # Результати йдуть у кільцевий буфер для /admin/perf, а заголовок Server-Timing
+    # бачать лише адміністратори, режим налагодження або PERF_SERVER_TIMING (бенчмарки).
+
+    def __init__(self, app, history=500):
+        self.app = app
+        self.n_plus_one_threshold = app.config.get('PERF_N_PLUS_ONE_THRESHOLD', 3)
+        self._samples = defaultdict(lambda: deque(maxlen=history))
+        self._n_plus_one = deque(maxlen=100)
+        self._lock = threading.Lock()
+
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+        before_render_template.connect(self._before_render, app)
+        template_rendered.connect(self._after_render, app)
+        app.before_request(self._start)
+        app.after_request(self._finish)
+
+    # SQL
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('perf_query_start', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['perf_query_start'].pop()
+        stats = g.get('_perf') if has_request_context() else None
+        if stats is not None:
+            stats['queries'] += 1
+            stats['sql_time'] += elapsed
+            if not executemany:
+                stats['statements'][statement].add(_parameters_key(parameters))
+
+    # Шаблони
+
+    def _before_render(self, sender, template, context, **extra):
+        stats = g.get('_perf')
+        if stats is not None:
+            stats['render_started'].append(time.perf_counter())
+
+    def _after_render(self, sender, template, context, **extra):
+        stats = g.get('_perf')
+        if stats is not None and stats['render_started']:
+            stats['render_time'] += time.perf_counter() - stats['render_started'].pop()
+
+    # Запит
+
+    def _start(self):
+        g._perf = {
+            'started': time.perf_counter(),
+            'queries': 0,
+            'sql_time': 0.0,
+            'render_time': 0.0,
+            'render_started': [],
+            'statements': defaultdict(set),
+        }
+
+    def _finish(self, response):
+        stats = g.pop('_perf', None)
+        if stats is None:
+            return response
+        total = time.perf_counter() - stats['started']
+        endpoint = request.endpoint or 'unknown'
+
+        # Той самий SQL з різними параметрами кілька разів за запит — ознака N+1;
+        # повтор з тими самими параметрами — інша проблема, і її сюди не зараховуємо
+        repeated = [(statement, len(variants)) for statement, variants in stats['statements'].items()
+                    if len(variants) >= self.n_plus_one_threshold]
+
+        with self._lock:
+            self._samples[endpoint].append((total, stats['queries'], stats['sql_time'], stats['render_time']))
+            for statement, count in repeated:
+                self._n_plus_one.append({'endpoint': endpoint, 'statement': statement, 'count': count,
+                                         'time': time.time()})
+
+        if self._show_timing():
+            response.headers.add('Server-Timing', ', '.join([
+                f'db;dur={stats["sql_time"] * 1000:.1f};desc="{stats["queries"]} queries"',
+                f'tpl;dur={stats["render_time"] * 1000:.1f}',
+                f'total;dur={total * 1000:.1f}',
+            ]))
+
+        budgets = self.app.config.get('PERF_QUERY_BUDGETS', {})
+        budget = budgets.get(endpoint, self.app.config.get('PERF_QUERY_BUDGET'))
+        if self.app.config.get('PERF_ENFORCE_BUDGET') and budget is not None and stats['queries'] > budget:
+            raise QueryBudgetExceeded(f'{endpoint}: {stats["queries"]} SQL-запитів при бюджеті {budget}')
+        return response
+
+    def _show_timing(self):
+        # Кількість запитів і час SQL підказують стороннім, які сторінки дорогі
+        if self.app.debug or self.app.config.get('PERF_SERVER_TIMING'):
+            return True
+        return current_user.is_authenticated and current_user.is_admin
+
+    # Звіт
+
+    def report(self):
+        with self._lock:
+            samples = {endpoint: list(values) for endpoint, values in self._samples.items()}
+            n_plus_one = list(self._n_plus_one)
+
+        routes = []
+        for endpoint, values in sorted(samples.items()):
+            durations = sorted(value[0] * 1000 for value in values)
+            histogram = Counter()
+            for duration in durations:
+                bucket = next((limit for limit in HISTOGRAM_BUCKETS if duration <= limit), None)
+                histogram[bucket] += 1
+            routes.append({
+                'endpoint': endpoint,
+                'count': len(values),
+                'p50_ms': percentile(durations, 50),
+                'p95_ms': percentile(durations, 95),
+                'p99_ms': percentile(durations, 99),
+                'avg_queries': sum(value[1] for value in values) / len(values),
+                'max_queries': max(value[1] for value in values),
+                'avg_sql_ms': sum(value[2] for value in values) * 1000 / len(values),
+                'avg_render_ms': sum(value[3] for value in values) * 1000 / len(values),
+                'histogram': [{'le': limit, 'count': histogram[limit]}
+                              for limit in HISTOGRAM_BUCKETS + (None,)],
+            })
+        return {'routes': routes, 'n_plus_one': n_plus_one}
+
+
+def percentile(sorted_values, percent):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(percent / 100 * (len(sorted_values) - 1))))
+    return round(sorted_values[index], 2)
@@ -0,0 +1,64 @@
+import logging
+import threading
+from datetime import datetime
+
+from sqlalchemy import select, update
+
+from db import db, News, NEWS_PUBLISHED, NEWS_SCHEDULED
+from search import index_documents
+
+logger = logging.getLogger(__name__)
+
+
+def publish_due(now=None):
+    # Усі новини, час яких настав, публікуються одним UPDATE за індексом (status, publish_at).
+    # Коміт позначає таблицю news зміненою, тож кеш сторінок і останніх новин скидається.
+    now = now or datetime.utcnow()
+    due = (News.status == NEWS_SCHEDULED, News.publish_at <= now)
+    rows = db.session.execute(select(News.id, News.title, News.content).where(*due)).all()
+    if not rows:
+        return 0
+    db.session.execute(update(News).where(*due).values(status=NEWS_PUBLISHED, created_at=News.publish_at),
+                       execution_options={'synchronize_session': False})
+    index_documents(db.session.connection(), 'news', rows)
+    db.session.commit()
+    return len(rows)
+
+
+class NewsScheduler:
+    # Фоновий потік, що раз на interval секунд публікує заплановані новини.
+    # Кожен воркер запускає свій; UPDATE ідемпотентний, тож новину публікує той, хто встиг першим.
+
+    def __init__(self, app, interval=30):
+        self.app = app
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        # Потік створюється ліниво, вже після fork воркера gunicorn
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='news-scheduler', daemon=True)
+                    self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                with self.app.app_context():
+                    self.tick()
+            except Exception:
+                logger.exception('Не вдалося опублікувати заплановані новини')
+            self._stop.wait(self.interval)
+
+    def tick(self):
+        # Коміт збільшує лічильник news у cache_versions, тож кеші скидають і інші воркери
+        published = publish_due()
+        if published:
+            logger.info('Опубліковано заплановані новини: %d', published)
+        return published
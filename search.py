@@ -0,0 +1,143 @@
+import re
+
+from markupsafe import Markup, escape
+from sqlalchemy import event, select, text
+from unidecode import unidecode
+
+from content import html_to_text
+from db import db, MenuItem, News, NEWS_PUBLISHED
+
+SEARCH_PER_PAGE = 20
+
+# rowid у search_index: id * 2 + тип, щоб оновлення та видалення йшли за первинним ключем
+KINDS = {'news': 0, 'page': 1}
+
+# Маркери підсвічування, які не трапляються в тексті; замінюються на <mark> після екранування
+_MARK_START, _MARK_END = '\x02', '\x03'
+
+CREATE_INDEX_SQL = """
+CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+    kind UNINDEXED,
+    ref UNINDEXED,
+    title,
+    body,
+    translit,
+    tokenize = 'unicode61 remove_diacritics 2'
+)
+"""
+
+
+def _is_sqlite(connection):
+    return connection.dialect.name == 'sqlite'
+
+
+def _rowid(kind, item_id):
+    return item_id * 2 + KINDS[kind]
+
+
+def _document(kind, item):
+    body = html_to_text(item.content)
+    return {
+        'rowid': _rowid(kind, item.id),
+        'kind': kind,
+        'ref': str(item.id) if kind == 'news' else item.slug,
+        'title': item.title,
+        'body': body,
+        # Транслітерація (як у generate_slug), щоб запит латиницею знаходив український текст
+        'translit': unidecode(f'{item.title} {body}'),
+    }
+
+
+def index_documents(connection, kind, items):
+    if not _is_sqlite(connection) or not items:
+        return
+    documents = [_document(kind, item) for item in items]
+    connection.execute(text('DELETE FROM search_index WHERE rowid = :rowid'),
+                       [{'rowid': document['rowid']} for document in documents])
+    connection.execute(text('INSERT INTO search_index (rowid, kind, ref, title, body, translit) '
+                            'VALUES (:rowid, :kind, :ref, :title, :body, :translit)'), documents)
+
+
+def remove_documents(connection, kind, ids):
+    if not _is_sqlite(connection) or not ids:
+        return
+    connection.execute(text('DELETE FROM search_index WHERE rowid = :rowid'),
+                       [{'rowid': _rowid(kind, item_id)} for item_id in ids])
+
+
+def create_search_index(connection):
+    if _is_sqlite(connection):
+        connection.execute(text(CREATE_INDEX_SQL))
+
+
+def rebuild_search_index(connection, kinds=('news', 'page')):
+    # Перебудова індексу; потрібна після масових вставок, які минають події ORM
+    if not _is_sqlite(connection):
+        return
+    create_search_index(connection)
+    for kind, model in (('news', News), ('page', MenuItem)):
+        if kind not in kinds:
+            continue
+        connection.execute(text('DELETE FROM search_index WHERE kind = :kind'), {'kind': kind})
+        columns = [model.id, model.title, model.content]
+        if model is MenuItem:
+            columns.append(model.slug)
+        statement = select(*columns)
+        if model is News:
+            # Заплановані новини потрапляють в індекс лише після публікації
+            statement = statement.where(News.status == NEWS_PUBLISHED)
+        index_documents(connection, kind, connection.execute(statement).all())
+
+
+def _register(model, kind, visible=None):
+    @event.listens_for(model, 'after_insert')
+    @event.listens_for(model, 'after_update')
+    def _index(mapper, connection, target):
+        if visible is None or visible(target):
+            index_documents(connection, kind, [target])
+        else:
+            remove_documents(connection, kind, [target.id])
+
+    @event.listens_for(model, 'after_delete')
+    def _remove(mapper, connection, target):
+        remove_documents(connection, kind, [target.id])
+
+
+_register(News, 'news', visible=lambda news: news.status == NEWS_PUBLISHED)
+_register(MenuItem, 'page')
+
+
+def _match_query(query):
+    # Кожне слово береться в лапки (без синтаксису FTS5) і шукається як префікс
+    return ' '.join(f'"{token}"*' for token in re.findall(r'\w+', query))
+
+
+def _highlight(value):
+    return Markup(str(escape(value)).replace(_MARK_START, '<mark>').replace(_MARK_END, '</mark>'))
+
+
+def search(query, page=1, per_page=SEARCH_PER_PAGE):
+    # Повертає (результати поточної сторінки, загальна кількість збігів)
+    match = _match_query(query)
+    connection = db.session.connection()
+    if not match or not _is_sqlite(connection):
+        return [], 0
+
+    total = connection.execute(text('SELECT count(*) FROM search_index WHERE search_index MATCH :match'),
+                               {'match': match}).scalar()
+    rows = connection.execute(text(f"""
+        SELECT kind, ref,
+               highlight(search_index, 2, '{_MARK_START}', '{_MARK_END}') AS title,
+               snippet(search_index, 3, '{_MARK_START}', '{_MARK_END}', '…', 24) AS snippet
+        FROM search_index
+        WHERE search_index MATCH :match
+        ORDER BY bm25(search_index, 0.0, 0.0, 10.0, 1.0, 0.5)
+        LIMIT :limit OFFSET :offset
+    """), {'match': match, 'limit': per_page, 'offset': (max(page, 1) - 1) * per_page}).all()
+
+    return [{
+        'kind': row.kind,
+        'ref': row.ref,
+        'title': _highlight(row.title),
+        'snippet': _highlight(row.snippet),
+    } for row in rows], total
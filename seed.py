@@ -0,0 +1,180 @@
+from datetime import datetime
+
+from sqlalchemy import insert
+
+from content import render_content
+from db import db, User, News, MenuItem
+from menu_io import import_menu
+from search import rebuild_search_index
+
+SAMPLE_NEWS = [
+    {
+        'title': '26 квітня — 39-та річниця Чорнобильської трагедії',
+        'image': 'chernobyl.jpg',
+        'content': 'Пам’ятаємо. Шануємо. Вічна слава героям Чорнобиля.',
+    },
+    {
+        'title': 'До уваги батьків майбутніх першокласників!',
+        'image': 'schoolkids.jpg',
+        'content': 'Оголошено набір у перші класи на 2025-2026 навчальний рік.',
+    },
+    {
+        'title': 'Лекторій «Тайм-менеджмент у професійній діяльності педагога»',
+        'image': 'lecture.jpg',
+        'content': 'Педагоги школи пройшли тренінг із сучасного планування робочого часу.',
+    },
+]
+
+# Головні пункти меню: (назва, slug, підпункти)
+MENU = [
+    ('ПРО ШКОЛУ', 'pro-shkolu', [
+        'Територія обслуговування школи',
+        'Візитка школи, Мережа класів',
+        'Структура та органи управління закладу освіти',
+        'Кадровий склад',
+        'Атестація педагогічних працівників',
+        'Правила поведінки учасників освітнього процесу',
+        'Матеріально-технічне забезпечення',
+        'Вимоги до навчального кабінету',
+        'Шкільна кінопанорама',
+        'Історія школи',
+        'Галерея',
+        'Незабутні шкільні роки (2017-2018)',
+    ]),
+    ('Зарахування до закладу освіти', 'zarahuvannya', [
+        'Зарахування до 1 класу',
+    ]),
+    ('Новини', 'novyny', []),
+    ('Контакти', 'kontakty', []),
+    ('Виконання вимог ст.30 Закону України "Про освіту"', 'pro-osvitu', [
+        'Положення про внутрішню систему забезпечення якості освіти',
+        'Положення про академічну доброчесність',
+        'Індивідуальна форма навчання',
+        'Організація інклюзивного навчання',
+        'Вакансії',
+        'Робота зі зверненнями громадян',
+        'Звіт про діяльність закладу освіти',
+        'Звіт керівника',
+    ]),
+    ('Результати державного контролю', 'derzhkontrol', []),
+    ('Освітній процес', 'osvitnij-proces', [
+        'Режим роботи',
+        'Розклад уроків',
+        'Освітні програми',
+        'Освітні компоненти',
+        'Критерії оцінювання навчальних досягнень учнів',
+        'Нова українська школа',
+        'На допомогу вчителю НУШ',
+        'Методична робота школи І ступеня',
+        'Новий освітній простір',
+        'Методична робота',
+        'Професійна рада',
+        'Предметні тижні',
+        'Сайти, блоги вчителів',
+        'Робота з талановитою молоддю',
+        'Результати моніторингу якості освіти',
+    ]),
+    ('Долаємо освітні втрати разом', 'dolajemo-vtraty', []),
+    ('НМТ - 2025', 'nmt-2025', []),
+    ('Здорове харчування', 'zdorove-harchuvannya', [
+        'Батькам про здорове харчування',
+        'Учням про здорове харчування',
+    ]),
+    ('Дистанційне навчання', 'distancijne-navchannya', []),
+    ('Актуальне: Булінг', 'buling', [
+        'Нормативно-правова база з питань булінгу',
+        'Права та обов\'язки учня',
+        'Правила поведінки здобувачів освіти',
+        'План заходів проти булінгу',
+        'Порядок подання та розгляду заяв',
+        'Порядок реагування на випадки булінгу',
+        'Відповідальні особи',
+        'Телефони довіри',
+        'Корисні поради',
+        'Поради учням',
+        'Поради батькам',
+        'Поради вчителям',
+        'Інформаційні матеріали',
+        'Всеукраїнська акція "16 днів проти насильства"',
+    ]),
+    ('Виховна робота', 'vykhovna-robota', [
+        'Нормативно-правове забезпечення виховної роботи',
+        'Система виховної роботи',
+        'Класному керівнику',
+        'Патріотичне виховання',
+        'Рій "Краяни"',
+        'КНИГА ЗВІТІВ рою "Краяни"',
+        'Профілактика правопорушень та злочинності',
+        'Робота з батьками',
+        'Профорієнтаційна робота',
+    ]),
+    ('Учнівське самоврядування', 'samospravy', []),
+    ('Канікули', 'kanikuly', []),
+    ('Психологічна служба', 'psyhologichna-sluzhba', [
+        'Національна дитяча гаряча лінія',
+        'Всеукраїнська програма ментального здоров\'я "Ти як?"',
+    ]),
+    ('Гендерна рівність', 'gender-equality', []),
+    ('Безпечне освітнє середовище', 'safe-environment', [
+        'Безпека життєдіяльності',
+        'Безпека дорожнього руху',
+        'Безпека в Інтернеті',
+        'Про протидію онлайн шахрайствам',
+        'Цивільний захист',
+        'Платформа МРІЯ',
+        'БРАМА - онлайн варта України',
+    ]),
+    ('Шкільна бібліотека', 'library', [
+        'Електронні підручники',
+        'Місячник шкільної бібліотеки',
+        'Конкурсний відбір проєктів учнів',
+        'Виховна робота бібліотеки',
+        'Новинки літератури',
+        'Літературні виставки',
+        'Медіатека',
+        'Букстейлери',
+        'Що читати учням влітку',
+    ]),
+    ('Фінансова діяльність', 'finansy', [
+        'Кошторис',
+        'Капітальні ремонти',
+        'Предмети закупівлі',
+    ]),
+    ('Енергозбереження', 'energozberezhennya', []),
+    ('Запитуйте - відповімо', 'faq', []),
+    ('Календар', 'calendar', []),
+]
+
+
+def menu_tree():
+    # Формат menu_io: slug підпунктів генерується так само, як при редагуванні пункту
+    return [{'title': title, 'slug': slug, 'url': '#',
+             'submenu': [{'title': sub, 'url': '#'} for sub in submenu]}
+            for title, slug, submenu in MENU]
+
+
+def seed_db(echo=print):
+    # Ідемпотентне наповнення: кожна таблиця заповнюється лише якщо вона порожня
+    changed = False
+
+    if not db.session.query(User.id).filter_by(username='admin').first():
+        admin = User(username='admin', is_admin=True)
+        admin.set_password('admin')
+        db.session.add(admin)
+        echo('Створено користувача admin')
+
+    if not db.session.query(News.id).first():
+        now = datetime.utcnow()
+        db.session.execute(insert(News), [dict(item, created_at=now, **render_content(item['content']))
+                                          for item in SAMPLE_NEWS])
+        changed = True
+        echo(f'Додано новин: {len(SAMPLE_NEWS)}')
+
+    if changed:
+        # Масові вставки минають події ORM, тож пошуковий індекс перебудовуємо явно
+        rebuild_search_index(db.session.connection(), kinds=('news',))
+    db.session.commit()
+
+    if not db.session.query(MenuItem.id).first():
+        count = import_menu(menu_tree())
+        echo(f'Додано пунктів меню: {count}')
@@ -0,0 +1,77 @@
+import hashlib
+import os
+import re
+import tempfile
+from abc import ABC, abstractmethod
+
+from flask import url_for
+
+# Імена файлів, які складаються з хешу вмісту, ніколи не змінюються — їх можна кешувати назавжди
+HASHED_NAME = re.compile(r'^[0-9a-f]{32}\.[a-z0-9]+$')
+
+
+class Storage(ABC):
+    # Інтерфейс сховища завантажених файлів
+
+    @abstractmethod
+    def save(self, stream, extension):
+        # Повертає (ім'я файлу, чи був файл створений уперше)
+        pass
+
+    @abstractmethod
+    def exists(self, name):
+        pass
+
+    @abstractmethod
+    def url(self, name):
+        pass
+
+
+class LocalStorage(Storage):
+    # Файли на локальному диску, адресовані за SHA-256 вмісту: однакові файли зберігаються один раз
+
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def exists(self, name):
+        return os.path.exists(self.path(name))
+
+    def url(self, name):
+        return url_for('static', filename=f'uploads/{name}')
+
+    def save(self, stream, extension):
+        digest = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                while True:
+                    chunk = stream.read(self.CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    f.write(chunk)
+
+            name = f'{digest.hexdigest()[:32]}.{extension.lower()}'
+            if self.exists(name):
+                os.remove(tmp_path)
+                return name, False
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, self.path(name))
+            return name, True
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+def make_storage(app):
+    backend = app.config.get('STORAGE_BACKEND', 'local')
+    if backend == 'local':
+        return LocalStorage(app.config['UPLOAD_FOLDER'])
+    raise ValueError(f'Невідоме сховище файлів: {backend}')